@@ -0,0 +1,357 @@
+import os
+import csv
+import sys
+import time
+import tempfile
+import numpy as np
+
+import tube_geometry
+
+
+# 性能测试，运行方法：python benchmark.py [测试名 ...]，不写测试名则运行全部测试
+
+
+# 随机生成 num_tube 根管道的控制点，每根管道 2~6 个控制点
+def make_ctrl_points(num_tube: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [rng.uniform(0, 2000, (rng.integers(2, 7), 3)) for _ in range(num_tube)]
+
+
+# NURBS 中心线：逐根 geomdl.NURBS.Curve 与 tube_geometry.eval_curves 批量计算对比
+def bench_nurbs(num_tube: int = 10000, delta: float = 0.01):
+    from geomdl import NURBS
+    from geomdl.knotvector import generate
+
+    list_ctrl_points = make_ctrl_points(num_tube)
+
+    time_start = time.perf_counter()
+    list_points_geomdl = []
+    for ctrl_points in list_ctrl_points:
+        curve = NURBS.Curve()
+        curve.degree = tube_geometry.get_degree(len(ctrl_points))
+        curve.ctrlpts = ctrl_points
+        curve.knotvector = generate(curve.degree, len(curve.ctrlpts))
+        curve.delta = delta
+        list_points_geomdl.append(np.array(curve.evalpts))
+    time_geomdl = time.perf_counter() - time_start
+
+    tube_geometry.get_basis.cache_clear()
+    time_start = time.perf_counter()
+    list_points_batch = tube_geometry.eval_curves(list_ctrl_points, delta)
+    time_batch = time.perf_counter() - time_start
+
+    num_diff = sum(not np.array_equal(a, b) for a, b in zip(list_points_geomdl, list_points_batch))
+    print('nurbs: {} tubes, geomdl {:.3f} s, batch {:.3f} s, speedup {:.1f}x, mismatched tubes {}'.format(
+        num_tube, time_geomdl, time_batch, time_geomdl / time_batch, num_diff))
+
+
+# 自适应取样：大部分为直管的管路上，固定 delta 与按弦高容差取样的中心线点数对比
+def bench_sampling(num_tube: int = 10000, tolerance: float = 1.0, ratio_straight: float = 0.8):
+    rng = np.random.default_rng(1)
+    list_ctrl_points = make_ctrl_points(num_tube)
+    for k in range(num_tube):
+        if rng.random() < ratio_straight:
+            list_ctrl_points[k] = list_ctrl_points[k][[0, -1]]
+
+    num_fixed = sum(len(points) for points in tube_geometry.eval_curves(list_ctrl_points))
+    time_start = time.perf_counter()
+    num_adaptive = sum(len(points) for points in tube_geometry.eval_curves_adaptive(list_ctrl_points, tolerance))
+    time_adaptive = time.perf_counter() - time_start
+    print('sampling: {} tubes ({:.0%} straight), fixed {} points, adaptive {} points ({:.1f}x fewer), '
+          'adaptive {:.3f} s'.format(num_tube, ratio_straight, num_fixed, num_adaptive, num_fixed / num_adaptive,
+                                     time_adaptive))
+
+
+# 管道网格生成：单进程与不同进程数的 parallel_geometry.TubeMeshBuilder 对比
+def bench_mesh(num_tube: int = 20000, tolerance: float = 1.0):
+    from parallel_geometry import TubeMeshBuilder
+
+    list_ctrl_points = make_ctrl_points(num_tube)
+    ids_tube = list(range(num_tube))
+    time_start = time.perf_counter()
+    list_points = tube_geometry.eval_centerlines(list_ctrl_points, 0.01, tolerance)
+    tube_geometry.build_network(ids_tube, list_points)
+    time_serial = time.perf_counter() - time_start
+    print('mesh: {} tubes, serial {:.3f} s'.format(num_tube, time_serial))
+
+    num_process = 2
+    while num_process <= (os.cpu_count() or 1):
+        time_start = time.perf_counter()
+        TubeMeshBuilder(num_process).build(ids_tube, list_ctrl_points, 0.01, tolerance)
+        time_parallel = time.perf_counter() - time_start
+        print('mesh: {} processes {:.3f} s, speedup {:.1f}x'.format(num_process, time_parallel,
+                                                                    time_serial / time_parallel))
+        num_process *= 2
+
+
+# tube_info.csv 解析：逐行 csv.reader 与 tube_table.TubeTable 一次读入对比
+def bench_parse(num_tube: int = 1000000):
+    from tube_table import TubeTable
+
+    rng = np.random.default_rng(2)
+    lines = ['id,a,b']
+    for k, num_ctrl in enumerate(rng.integers(0, 5, num_tube)):
+        lines.append(','.join([str(k), str(rng.integers(0, 1000)), str(rng.integers(0, 1000))] +
+                              ['{:.3f}'.format(value) for value in rng.uniform(0, 2000, 3 * num_ctrl)]))
+    with tempfile.TemporaryDirectory() as path_folder:
+        path_file = os.path.join(path_folder, 'tube_info.csv')
+        with open(path_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        time_start = time.perf_counter()
+        line_tube = []
+        with open(path_file, newline='', encoding='utf-8') as f:
+            f_reader = csv.reader(f)
+            next(f_reader)
+            for f_row in f_reader:
+                if len(f_row) % 3 == 0:
+                    line_tube.append(list(map(float, f_row)))
+        time_rows = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        table = TubeTable.read(path_file)
+        time_table = time.perf_counter() - time_start
+
+    num_diff = sum(not (row[1:3] == table.joints[k].tolist() and
+                        row[3:] == table.points[table.offsets[k]:table.offsets[k + 1]].ravel().tolist())
+                   for k, row in enumerate(line_tube))
+    print('parse: {} rows, csv.reader {:.3f} s, TubeTable {:.3f} s, speedup {:.1f}x, mismatched rows {}'.format(
+        num_tube, time_rows, time_table, time_rows / time_table, num_diff))
+
+
+# 每帧更新管道标量：原来的逐管道 np.linspace 与 TubeNetwork.set_frame 整帧按弧长插值对比，管道数逐级增加
+# set_frame 的结果与 float64 的 a + (b − a) × t 对比
+def bench_frame(nums_tube=(1000, 10000, 50000), num_frame: int = 10):
+    for num_tube in nums_tube:
+        rng = np.random.default_rng(3)
+        num_joint = num_tube // 2 + 2
+        endpoints = rng.integers(0, num_joint, (num_tube, 2))
+        list_points = [rng.uniform(0, 2000, (rng.integers(2, 20), 3)) for _ in range(num_tube)]
+        network = tube_geometry.build_network(list(range(num_tube)), list_points)
+        network.set_endpoints(endpoints[network.ids_tube])
+        frames = rng.uniform(0, 100, (num_frame, num_joint))
+
+        time_start = time.perf_counter()
+        for data_now in frames:
+            for k in range(network.num_tube):
+                data_tube = network.get_data(k)
+                data_tube[:] = np.linspace(start=data_now[int(endpoints[network.ids_tube[k], 0])],
+                                           stop=data_now[int(endpoints[network.ids_tube[k], 1])],
+                                           num=len(data_tube))
+            network.set_modified()
+        time_loop = (time.perf_counter() - time_start) / num_frame
+
+        time_start = time.perf_counter()
+        for data_now in frames:
+            network.set_frame(data_now)
+        time_frame = (time.perf_counter() - time_start) / num_frame
+        start, stop = frames[-1][network.joints_point]
+        data_ref = start + (stop - start) * network.mesh.point_data['t']
+
+        print('frame: {} tubes, {} points, loop {:.2f} ms, set_frame {:.2f} ms ({:.1f} ns/point), speedup {:.0f}x, '
+              'max diff {:.1e}'.format(num_tube, network.mesh.n_points, 1000 * time_loop, 1000 * time_frame,
+                                       1e9 * time_frame / network.mesh.n_points, time_loop / time_frame,
+                                       np.abs(data_ref - network.mesh.point_data['data']).max()))
+
+
+# 时序数据：TimeSeries.append 逐步追加 num_step 个时间步，与每步 np.concatenate 对比（后者只测前 num_step_concat 步）
+# 各输出 num_block 段的单步耗时，TimeSeries 各段应基本持平，np.concatenate 随已有步数线性增长
+def bench_series(num_step: int = 100000, num_joint: int = 200, num_step_concat: int = 2000, num_block: int = 4):
+    from time_series import TimeSeries
+
+    rng = np.random.default_rng(0)
+    frame = rng.uniform(0, 100, (3, num_joint))
+
+    series = TimeSeries(3, num_joint)
+    times_block = []
+    time_start = time.perf_counter()
+    for k in range(num_step):
+        series.append(frame, k)
+        if (k + 1) % (num_step // num_block) == 0:
+            times_block.append(time.perf_counter())
+    time_series = times_block[-1] - time_start
+    times_block = np.diff([time_start] + times_block) / (num_step // num_block)
+
+    data = None
+    times_concat = []
+    time_start = time.perf_counter()
+    for k in range(num_step_concat):
+        data_t = np.expand_dims(frame, axis=0)
+        data = data_t if data is None else np.concatenate([data, data_t], axis=0)
+        if (k + 1) % (num_step_concat // num_block) == 0:
+            times_concat.append(time.perf_counter())
+    time_concat = times_concat[-1] - time_start
+    times_concat = np.diff([time_start] + times_concat) / (num_step_concat // num_block)
+
+    print('series: {} steps x {} joints, append {:.2f} s ({:.1f} us/step), per block [{}] us/step, '
+          'capacity {}'.format(num_step, num_joint, time_series, 1e6 * time_series / num_step,
+                               ', '.join('{:.1f}'.format(1e6 * t) for t in times_block), len(series.buffer)))
+    print('series: {} steps x {} joints, concatenate {:.2f} s ({:.1f} us/step), per block [{}] us/step, '
+          'append is {:.0f}x faster over the same steps'.format(
+              num_step_concat, num_joint, time_concat, 1e6 * time_concat / num_step_concat,
+              ', '.join('{:.1f}'.format(1e6 * t) for t in times_concat),
+              time_concat / (num_step_concat * time_series / num_step)))
+    assert series.shape == (num_step, 3, num_joint) and np.array_equal(series[-1], data[-1])
+
+
+# 随机生成 num_file 个时间步文件 input_k.csv，每个文件 num_joint 行（关节编号，速度，压强，温度）
+def make_data_folder(path_folder: str, num_file: int, num_joint: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    os.makedirs(path_folder, exist_ok=True)
+    for k in range(num_file):
+        data = np.column_stack([np.arange(num_joint), rng.uniform(0, 100, (num_joint, 3))])
+        np.savetxt(os.path.join(path_folder, 'input_{}.csv'.format(k)), data, fmt=['%d', '%.6f', '%.6f', '%.6f'],
+                   delimiter=',', header='id,v,p,T', comments='')
+
+
+# 当前进程占用的物理内存（MB），仅 Linux
+def get_rss() -> float:
+    with open('/proc/self/status') as file:
+        for line in file:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+# 数据文件夹读取：原先的逐个 pd.read_csv + 列表 + np.array 与 data_loader.DataLoader（单进程、多进程）对比
+def bench_load(num_file: int = 2000, num_joint: int = 1000, num_process: int = os.cpu_count() or 1):
+    import pandas as pd
+    from data_loader import DataLoader, list_data_files
+
+    with tempfile.TemporaryDirectory() as path_temp:
+        path_folder = os.path.join(path_temp, 'input')
+        make_data_folder(path_folder, num_file, num_joint)
+        data_files = list_data_files(path_folder)
+
+        time_start = time.perf_counter()
+        data_loop = []
+        for time_id, name_file in data_files:
+            data_t = pd.read_csv(os.path.join(path_folder, name_file), header=0,
+                                 encoding='utf-8').fillna(0).to_numpy()[:, 1:4]
+            data_loop.append(data_t.T)
+        data_loop = np.array(data_loop)
+        time_loop = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        data_single, flags = DataLoader(path_folder, data_files, 1).work()
+        time_single = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        data_parallel, flags = DataLoader(path_folder, data_files, num_process).work()
+        time_parallel = time.perf_counter() - time_start
+
+    print('load: {} files x {} joints, loop {:.2f} s ({:.0f} files/s), loader 1 process {:.2f} s ({:.0f} files/s), '
+          'loader {} processes {:.2f} s ({:.0f} files/s), speedup {:.1f}x'.format(
+              num_file, num_joint, time_loop, num_file / time_loop, time_single, num_file / time_single,
+              num_process, time_parallel, num_file / time_parallel, time_loop / time_parallel))
+    assert np.array_equal(data_loop, data_single.view) and np.array_equal(data_loop, data_parallel.view)
+
+
+# 打包的时序数据：文件夹转换为打包文件，与读取 csv 文件夹对比打开时间；
+# 再构造一个 size_gb 的稀疏打包文件，测打开时间与逐帧访问时的物理内存增长
+def bench_pack(num_file: int = 1000, num_joint: int = 1000, size_gb: float = 10, num_frame_view: int = 100):
+    import data_pack
+    from data_loader import DataLoader, list_data_files
+
+    with tempfile.TemporaryDirectory() as path_temp:
+        path_folder = os.path.join(path_temp, 'input')
+        make_data_folder(path_folder, num_file, num_joint)
+        path_pack = os.path.join(path_temp, 'input' + data_pack.PACK_SUFFIX)
+
+        time_start = time.perf_counter()
+        data_csv, flags = DataLoader(path_folder, list_data_files(path_folder), 1).work()
+        time_csv = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        data_pack.pack_folder(path_folder, path_pack)
+        time_convert = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        data, head = data_pack.open_pack(path_pack)
+        time_open = time.perf_counter() - time_start
+        print('pack: {} files x {} joints, read csv {:.2f} s, convert {:.2f} s, open {:.2f} ms, file {:.1f} MB, '
+              'max diff {:.1e}'.format(num_file, num_joint, time_csv, time_convert, 1000 * time_open,
+                                       os.path.getsize(path_pack) / 2 ** 20,
+                                       np.abs(data.view - data_csv.view).max()))
+        del data
+
+        # 稀疏文件：只写文件头与时间步编号，数据块不占磁盘
+        num_step = int(size_gb * 2 ** 30 / (data_pack.DATA_DTYPE.itemsize * 3 * num_joint))
+        path_big = os.path.join(path_temp, 'big' + data_pack.PACK_SUFFIX)
+        offset_data = data_pack.get_offset_data(num_step)
+        with open(path_big, 'wb') as file:
+            file.truncate(offset_data + data_pack.DATA_DTYPE.itemsize * 3 * num_joint * num_step)
+        data_pack.write_header(path_big, (3, num_joint), num_step, data_pack.HEADER_SIZE, offset_data, 'big_')
+        with open(path_big, 'r+b') as file:
+            file.seek(data_pack.HEADER_SIZE)
+            file.write(np.arange(num_step, dtype='<i8').tobytes())
+
+        rss_start = get_rss()
+        time_start = time.perf_counter()
+        data, head = data_pack.open_pack(path_big)
+        time_open = time.perf_counter() - time_start
+        rss_open = get_rss()
+        time_start = time.perf_counter()
+        for t in np.linspace(0, num_step - 1, num_frame_view).astype(int):
+            data_now = np.array(data[t, 0, :])
+        time_view = (time.perf_counter() - time_start) / num_frame_view
+        rss_view = get_rss()
+        print('pack: {:.1f} GB file ({} steps x {} joints), open {:.2f} ms, rss +{:.1f} MB after open, '
+              '+{:.1f} MB after viewing {} frames ({:.1f} MB of frame data), {:.3f} ms/frame'.format(
+                  os.path.getsize(path_big) / 2 ** 30, num_step, num_joint, 1000 * time_open, rss_open - rss_start,
+                  rss_view - rss_start, num_frame_view, num_frame_view * 3 * num_joint * 4 / 2 ** 20,
+                  1000 * time_view))
+        del data, data_now
+
+
+# 延迟读取：打开到显示第一帧的时间与全部读入对比，再按 LRU 缓存回放，缓存大小不超过预算
+def bench_lazy(num_file: int = 2000, num_joint: int = 1000, num_frame_budget: int = 100, num_pass: int = 2):
+    from data_loader import DataLoader, LazySeries, list_data_files
+
+    with tempfile.TemporaryDirectory() as path_temp:
+        path_folder = os.path.join(path_temp, 'input')
+        make_data_folder(path_folder, num_file, num_joint)
+        data_files = list_data_files(path_folder)
+
+        time_start = time.perf_counter()
+        data_all, flags = DataLoader(path_folder, data_files, 1).work()
+        frame_first = data_all[0, 0, :]
+        time_all = time.perf_counter() - time_start
+
+        budget = num_frame_budget * 3 * num_joint * 8
+        time_start = time.perf_counter()
+        data_lazy = LazySeries(path_folder, data_files, budget)
+        frame_first = data_lazy[0, 0, :]
+        time_lazy = time.perf_counter() - time_start
+
+        # 在最后 num_frame_budget 个时间步内来回播放 num_pass 遍，第一遍之后全部命中缓存；再顺序播放全部时间步
+        nbytes_max = 0
+        time_start = time.perf_counter()
+        for k in list(range(num_file - num_frame_budget, num_file)) * num_pass + list(range(num_file)):
+            frame = data_lazy[k, 0, :]
+            nbytes_max = max(nbytes_max, data_lazy.nbytes)
+        time_play = time.perf_counter() - time_start
+        diff = max(np.abs(data_lazy[k] - data_all[k]).max() for k in (0, num_file // 2, num_file - 1))
+
+    print('lazy: {} files x {} joints, first frame {:.1f} ms (load all {:.2f} s), playback {:.2f} ms/frame, '
+          'hits {} misses {}, cache max {:.1f} MB (budget {:.1f} MB, all frames {:.1f} MB), max diff {:.1e}'.format(
+              num_file, num_joint, 1000 * time_lazy, time_all,
+              1000 * time_play / ((num_pass * num_frame_budget) + num_file), data_lazy.num_hit,
+              data_lazy.num_miss, nbytes_max / 2 ** 20, budget / 2 ** 20, data_all.view.nbytes / 2 ** 20, diff))
+
+
+BENCHES = {
+    'nurbs': bench_nurbs,
+    'sampling': bench_sampling,
+    'mesh': bench_mesh,
+    'parse': bench_parse,
+    'frame': bench_frame,
+    'series': bench_series,
+    'load': bench_load,
+    'pack': bench_pack,
+    'lazy': bench_lazy,
+}
+
+if __name__ == '__main__':
+    for name in (sys.argv[1:] or BENCHES):
+        BENCHES[name]()
@@ -0,0 +1,255 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import numpy as np
+import pandas as pd
+
+from jobs import Job
+from time_series import TimeSeries
+
+# 每个子进程任务读取的文件数
+NUM_FILE_CHUNK: int = 256
+
+
+# 时序文件夹内的数据文件：若文件夹名为 input，则取名为 input_xx.csv 的文件
+# 返回按时间步 xx 排序的（时间步，文件名）列表
+def list_data_files(path_folder: str) -> list:
+    data_file_head = os.path.basename(os.path.normpath(path_folder)) + '_'
+    data_files = []
+    for name_file in os.listdir(path_folder):
+        time_id = get_time_id(name_file, data_file_head)
+        if time_id is not None:
+            data_files.append((time_id, name_file))
+    return sorted(data_files)
+
+
+# 数据文件名 input_xx.csv 中的时间步 xx（data_file_head 为 'input_'），不是该文件夹的数据文件时返回 None
+# 按长度截去前缀与后缀，不能用 lstrip/rstrip（会按字符集删去，如 'run1_12.csv' 得到 2）
+def get_time_id(name_file: str, data_file_head: str):
+    name_id = name_file[len(data_file_head):-len('.csv')]
+    if name_file.startswith(data_file_head) and name_file.endswith('.csv') and name_id.isdigit():
+        return int(name_id)
+    return None
+
+
+# 一个时间步的数据，按（物理量，关节编号）的顺序
+def read_data_file(path_file: str) -> np.ndarray:
+    return pd.read_csv(path_file, header=0, encoding='utf-8').fillna(0).to_numpy()[:, 1:4].T
+
+
+# 依次读取 paths 中的文件，第 i 个写入 data[i]；维度与 data[i] 不一致的文件算作读取失败
+# 返回各文件是否读取成功
+def read_into(data: np.ndarray, paths: list) -> np.ndarray:
+    flags = np.zeros(len(paths), dtype=bool)
+    for i, path_file in enumerate(paths):
+        try:
+            frame = read_data_file(path_file)
+            if frame.shape == data.shape[1:]:
+                data[i] = frame
+                flags[i] = True
+        except Exception as error:
+            pass
+    return flags
+
+
+# 子进程任务：读取一段文件，返回（该段的数据，各文件是否读取成功），均为 numpy 数组，可直接序列化传回主进程
+def read_chunk(paths: list, shape: tuple):
+    data = np.zeros((len(paths),) + tuple(shape))
+    return data, read_into(data, paths)
+
+
+# 多进程读取时序文件夹：文件按时间步分段交给进程池，按时间步顺序写入预先分配的（时间步，物理量，关节编号）数组
+# 读取失败的时间步不占位置，已写入的部分始终是连续的前若干个时间步，可在读取过程中先行显示
+class DataLoader(Job):
+    """多文件并行读取器，可在 QThread 里运行（见 jobs.JobRunner），也可直接调用 self.work()
+
+    每完成一段发出一次进度信号，并以 self.partial 发出已读取成功的时间步（时序数据，与最终结果共用同一数组，不复制）。
+    self.work() 返回（时序数据，各文件的读取情况），读取情况为 1（成功）、0（失败）或 -1（取消时尚未读取）；
+    时序数据只含读取成功的时间步，全部失败时为 None；每个时间步的维度以第一个读取成功的文件为准。
+    """
+
+    def __init__(self, path_folder: str, data_files: list, num_process: int = 1):
+        super().__init__()
+        # data_files 见 list_data_files
+        self.path_folder = path_folder
+        self.data_files = data_files
+        self.num_process = num_process
+        # 已写入数组的时间步数
+        self.num_ready: int = 0
+
+    def work(self):
+        paths = [os.path.join(self.path_folder, name_file) for _, name_file in self.data_files]
+        flags = np.full(len(paths), -1, dtype=np.int8)
+        num_done = 0
+        self.report(num_done, len(paths), '数据文件读取中')
+        # 读取到第一个读取成功的文件为止，确定数组的维度
+        frame = None
+        while (frame is None) and (num_done < len(paths)):
+            try:
+                frame = read_data_file(paths[num_done])
+            except Exception as error:
+                frame = None
+            flags[num_done] = 0 if frame is None else 1
+            num_done += 1
+        if frame is None:
+            return None, flags.tolist()
+        data = np.empty((len(paths),) + frame.shape)
+        time_ids = np.empty(len(paths), dtype=np.int64)
+        data[0] = frame
+        time_ids[0] = self.data_files[num_done - 1][0]
+        self.num_ready = 1
+        self.partial.emit(TimeSeries.from_array(data[:1], time_ids[:1]))
+
+        starts = list(range(num_done, len(paths), NUM_FILE_CHUNK))
+        num_next = 0
+        if (self.num_process > 1) and (len(starts) > 1) and self.report(num_done, len(paths), '数据文件读取中'):
+            # 用 spawn 启动子进程，避免 fork 复制主进程中的 Qt 与 vtk 状态；各段按时间步顺序取回
+            # 子进程出错时，其余各段退回单进程读取
+            try:
+                with ProcessPoolExecutor(max_workers=self.num_process,
+                                         mp_context=multiprocessing.get_context('spawn')) as executor:
+                    results = executor.map(read_chunk, [paths[start:start + NUM_FILE_CHUNK] for start in starts],
+                                           [frame.shape] * len(starts))
+                    for data_chunk, flags_chunk in results:
+                        self.write_chunk(data, time_ids, flags, starts[num_next], data_chunk, flags_chunk)
+                        num_next += 1
+                        if not self.report(min(starts[num_next - 1] + NUM_FILE_CHUNK, len(paths)), len(paths),
+                                           '数据文件读取中'):
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            break
+            except Exception as error:
+                pass
+        # 单进程：直接读入数组的空余位置
+        for start in starts[num_next:]:
+            if self.flag_cancel:
+                break
+            paths_chunk = paths[start:start + NUM_FILE_CHUNK]
+            data_chunk = data[self.num_ready:self.num_ready + len(paths_chunk)]
+            self.write_chunk(data, time_ids, flags, start, data_chunk, read_into(data_chunk, paths_chunk), True)
+            self.report(start + len(paths_chunk), len(paths), '数据文件读取中')
+        return TimeSeries.from_array(data[:self.num_ready], time_ids[:self.num_ready]), flags.tolist()
+
+    # 把一段中读取成功的时间步依次写入 data[self.num_ready:]，并发出部分结果
+    # in_place 为 True 时 data_chunk 就是 data[self.num_ready:] 的一段，全部读取成功则无需复制
+    def write_chunk(self, data, time_ids, flags, start: int, data_chunk, flags_chunk, in_place: bool = False):
+        num_ok = int(flags_chunk.sum())
+        if (not in_place) or (num_ok < len(flags_chunk)):
+            data[self.num_ready:self.num_ready + num_ok] = data_chunk[flags_chunk]
+        time_ids[self.num_ready:self.num_ready + num_ok] = [self.data_files[start + i][0]
+                                                            for i in np.flatnonzero(flags_chunk)]
+        flags[start:start + len(flags_chunk)] = flags_chunk
+        self.num_ready += num_ok
+        self.partial.emit(TimeSeries.from_array(data[:self.num_ready], time_ids[:self.num_ready]))
+
+
+# 延迟读取的时序数据：打开时只列出文件，各时间步在首次访问时才读取，按最近最少使用的顺序淘汰
+class LazySeries:
+    """按（时间步，物理量，关节编号）访问的延迟读取时序数据，下标用法与 time_series.TimeSeries 相同
+
+    已读取的时间步保存在 self.frames 中，总字节数不超过 self.budget（至少保留最近访问的一个）。
+    打开时读取到第一个读取成功的文件为止，用于确定每个时间步的维度；读取失败的时间步为全零，
+    self.flags[k] 为 -1（未读取）、0（失败）或 1（成功），之后每个文件读取失败时调用一次 callback(文件名)，
+    读取失败的文件不再重复读取。
+    """
+
+    def __init__(self, path_folder: str, data_files: list, budget: int = 1 << 30, callback=None):
+        self.path_folder = path_folder
+        self.names_file = [name_file for _, name_file in data_files]
+        self.buffer_time_ids = [time_id for time_id, _ in data_files]
+        self.flags = [-1] * len(data_files)
+        self.budget = budget
+        self.callback = callback
+        # 已读取的时间步：{时间步序号: （物理量，关节编号）数组}，最近访问的在最后
+        self.frames = OrderedDict()
+        self.nbytes: int = 0
+        self.num_hit: int = 0
+        self.num_miss: int = 0
+        self.shape_frame = None
+        self.frame_zero = None
+        for k in range(len(self.names_file)):
+            if self.read_frame(k) is not None:
+                break
+
+    def __len__(self):
+        return len(self.names_file)
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            return self.get_frame(key[0])[key[1:]]
+        return self.get_frame(key)
+
+    @property
+    def time_ids(self) -> np.ndarray:
+        return np.array(self.buffer_time_ids, dtype=np.int64)
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self),) + (self.shape_frame if self.shape_frame is not None else (0, 0))
+
+    # 全部时间步读入内存所需的字节数
+    def get_nbytes_total(self) -> int:
+        if self.shape_frame is None:
+            return 0
+        return len(self) * int(np.prod(self.shape_frame)) * np.dtype(np.float64).itemsize
+
+    # 第 k 个时间步，未读取过则读取并加入缓存；读取失败的时间步为全零，只在第一次失败时调用 callback
+    def get_frame(self, k: int) -> np.ndarray:
+        k = range(len(self))[k]
+        frame = self.frames.get(k)
+        if frame is not None:
+            self.frames.move_to_end(k)
+            self.num_hit += 1
+            return frame
+        if self.flags[k] == 0:
+            self.num_hit += 1
+            return self.get_frame_zero()
+        self.num_miss += 1
+        frame = self.read_frame(k)
+        if frame is None:
+            if self.callback is not None:
+                self.callback(self.names_file[k])
+            return self.get_frame_zero()
+        return frame
+
+    # 读取失败的时间步共用的全零数组，只读，不计入缓存
+    def get_frame_zero(self) -> np.ndarray:
+        shape_frame = self.shape_frame if self.shape_frame is not None else (0, 0)
+        if (self.frame_zero is None) or (self.frame_zero.shape != shape_frame):
+            self.frame_zero = np.zeros(shape_frame)
+            self.frame_zero.flags.writeable = False
+        return self.frame_zero
+
+    # 读取第 k 个时间步并加入缓存，读取失败或维度与已有数据不一致时返回 None
+    def read_frame(self, k: int):
+        try:
+            frame = read_data_file(os.path.join(self.path_folder, self.names_file[k])).astype(np.float64)
+            if (self.shape_frame is not None) and (frame.shape != self.shape_frame):
+                frame = None
+        except Exception as error:
+            frame = None
+        self.flags[k] = 0 if frame is None else 1
+        if frame is not None:
+            self.shape_frame = frame.shape
+            self.put_frame(k, frame)
+        return frame
+
+    # 加入缓存，超出预算时淘汰最近最少使用的时间步
+    def put_frame(self, k: int, frame: np.ndarray):
+        if k in self.frames:
+            self.nbytes -= self.frames.pop(k).nbytes
+        self.frames[k] = frame
+        self.nbytes += frame.nbytes
+        while (self.nbytes > self.budget) and (len(self.frames) > 1):
+            self.nbytes -= self.frames.popitem(last=False)[1].nbytes
+
+    # 追加一个已读取的时间步（文件夹中新出现的文件），维度与已有数据不一致时抛出 ValueError
+    def append_file(self, name_file: str, time_id: int, frame):
+        frame = np.asarray(frame, dtype=np.float64)
+        if (self.shape_frame is not None) and (frame.shape != self.shape_frame):
+            raise ValueError('时间步的维度 {} 与已有数据 {} 不一致'.format(frame.shape, self.shape_frame))
+        self.shape_frame = frame.shape
+        self.names_file.append(name_file)
+        self.buffer_time_ids.append(int(time_id))
+        self.flags.append(1)
+        self.put_frame(len(self) - 1, frame)
@@ -0,0 +1,153 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import sys
+import numpy as np
+
+from data_loader import NUM_FILE_CHUNK, list_data_files, read_chunk, read_data_file
+from time_series import TimeSeries
+
+# 打包的时序数据文件：把一个时序文件夹（input_xx.csv）存为一个二进制文件，打开时内存映射，不解析文本
+# 文件结构：文件头（HEADER_SIZE 字节） + 时间步编号（int64 × 时间步数） + 数据块（float32，按（时间步，物理量，关节编号）连续存放）
+# 数据块从 ALIGN_DATA 的整数倍处开始，数据块之后没有其它内容
+# 命令行运行方法：python data_pack.py 时序文件夹 输出文件 [进程数]
+
+PACK_SUFFIX = '.tsd'
+PACK_MAGIC = b'FTTSDATA'
+PACK_VERSION: int = 1
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4'), ('num_attr', '<u4'), ('num_joint', '<u8'),
+                         ('num_step', '<u8'), ('offset_index', '<u8'), ('offset_data', '<u8'), ('head', 'S256')])
+HEADER_SIZE: int = 512
+ALIGN_DATA: int = 4096
+DATA_DTYPE = np.dtype('<f4')
+# 转换时每段读取的数据量上限（字节），关节很多时每段的文件数相应减少
+BYTES_CHUNK: int = 1 << 26
+
+
+# 写入文件头，其余部分不变
+def write_header(path_file: str, shape: tuple, num_step: int, offset_index: int, offset_data: int, head: str):
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header['magic'] = PACK_MAGIC
+    header['version'] = PACK_VERSION
+    header['num_attr'], header['num_joint'] = shape
+    header['num_step'] = num_step
+    header['offset_index'] = offset_index
+    header['offset_data'] = offset_data
+    header['head'] = head.encode('utf-8')
+    with open(path_file, 'r+b') as file:
+        file.write(header.tobytes())
+
+
+# 数据块的起始位置：时间步编号之后，对齐到 ALIGN_DATA
+def get_offset_data(num_step: int) -> int:
+    return -(-(HEADER_SIZE + 8 * num_step) // ALIGN_DATA) * ALIGN_DATA
+
+
+# 打开打包文件：时间步编号读入内存，数据块内存映射为只读数组，不读取数据
+# 返回（时序数据，文件名前缀如 'input_'），没有时间步时时序数据为 None；文件格式不正确时抛出 ValueError
+def open_pack(path_file: str):
+    header = np.fromfile(path_file, dtype=HEADER_DTYPE, count=1)
+    if (len(header) == 0) or (header['magic'][0] != PACK_MAGIC):
+        raise ValueError('不是打包的时序数据文件：' + path_file)
+    header = header[0]
+    if int(header['version']) != PACK_VERSION:
+        raise ValueError('不支持的版本：{}'.format(int(header['version'])))
+    num_step = int(header['num_step'])
+    shape = (num_step, int(header['num_attr']), int(header['num_joint']))
+    if os.path.getsize(path_file) < int(header['offset_data']) + DATA_DTYPE.itemsize * int(np.prod(shape)):
+        raise ValueError('文件不完整：' + path_file)
+    head = bytes(header['head']).decode('utf-8')
+    if num_step == 0:
+        return None, head
+    time_ids = np.fromfile(path_file, dtype='<i8', count=num_step, offset=int(header['offset_index']))
+    data = np.memmap(path_file, dtype=DATA_DTYPE, mode='r', offset=int(header['offset_data']), shape=shape)
+    return TimeSeries.from_array(data, time_ids), head
+
+
+# 把时序文件夹 path_folder 打包为 path_file，先写入临时文件，完成后再替换，转换失败不会留下不完整的文件
+# 各文件按时间步顺序逐段读取，直接写入数据块，内存中只有一段；num_process > 1 时多进程读取
+# 返回（data_files，各文件是否读取成功），data_files 见 data_loader.list_data_files；读取失败的时间步不写入
+# callback(已读取的文件数, 文件总数) 在每段完成后调用
+def pack_folder(path_folder: str, path_file: str, num_process: int = 1, callback=None):
+    data_files = list_data_files(path_folder)
+    paths = [os.path.join(path_folder, name_file) for _, name_file in data_files]
+    head = os.path.basename(os.path.normpath(path_folder)) + '_'
+    flags = np.zeros(len(paths), dtype=bool)
+    # 第一个读取成功的文件决定每个时间步的维度（物理量，关节编号）
+    shape = None
+    for path_data in paths:
+        try:
+            shape = read_data_file(path_data).shape
+            break
+        except Exception as error:
+            continue
+    if shape is None:
+        shape = (0, 0)
+
+    offset_index = HEADER_SIZE
+    offset_data = get_offset_data(len(paths))
+    bytes_frame = DATA_DTYPE.itemsize * shape[0] * shape[1]
+    path_temp = path_file + '.part'
+    # 按全部文件预留空间（稀疏文件，不实际占用磁盘），最后截去读取失败的部分
+    with open(path_temp, 'wb') as file:
+        file.truncate(offset_data + bytes_frame * len(paths))
+    time_ids = np.zeros(len(paths), dtype='<i8')
+    num_step = 0
+    try:
+        if bytes_frame > 0:
+            data = np.memmap(path_temp, dtype=DATA_DTYPE, mode='r+', offset=offset_data,
+                             shape=(len(paths),) + shape)
+            num_file_chunk = max(1, min(NUM_FILE_CHUNK, BYTES_CHUNK // (2 * bytes_frame)))
+            starts = list(range(0, len(paths), num_file_chunk))
+            chunks = [paths[start:start + num_file_chunk] for start in starts]
+            # 各段按顺序取回，读取成功的时间步依次写入数据块
+            if (num_process > 1) and (len(chunks) > 1):
+                # 用 spawn 启动子进程，避免 fork 复制主进程中的 Qt 与 vtk 状态
+                executor = ProcessPoolExecutor(max_workers=num_process,
+                                               mp_context=multiprocessing.get_context('spawn'))
+                results = executor.map(read_chunk, chunks, [shape] * len(chunks))
+            else:
+                executor = None
+                results = map(read_chunk, chunks, [shape] * len(chunks))
+            try:
+                for start, (data_chunk, flags_chunk) in zip(starts, results):
+                    num_ok = int(flags_chunk.sum())
+                    data[num_step:num_step + num_ok] = data_chunk[flags_chunk]
+                    time_ids[num_step:num_step + num_ok] = [data_files[start + i][0] for i in
+                                                            np.flatnonzero(flags_chunk)]
+                    flags[start:start + len(flags_chunk)] = flags_chunk
+                    num_step += num_ok
+                    if callback is not None:
+                        callback(start + len(flags_chunk), len(paths))
+            finally:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+            data.flush()
+            del data
+
+        write_header(path_temp, shape, num_step, offset_index, offset_data, head)
+        with open(path_temp, 'r+b') as file:
+            file.seek(offset_index)
+            file.write(time_ids.tobytes())
+            file.truncate(offset_data + bytes_frame * num_step)
+        os.replace(path_temp, path_file)
+    except BaseException as error:
+        if os.path.exists(path_temp):
+            os.remove(path_temp)
+        raise
+    return data_files, flags.tolist()
+
+
+# 命令行：打包一个时序文件夹，并显示读取失败的文件
+def main(argv: list):
+    path_folder, path_file = argv[0:2]
+    num_process = int(argv[2]) if len(argv) > 2 else (os.cpu_count() or 1)
+    data_files, flags = pack_folder(path_folder, path_file, num_process,
+                                    callback=lambda num_done, num_total: print('{} / {}'.format(num_done, num_total)))
+    for (time_id, name_file), flag in zip(data_files, flags):
+        if not flag:
+            print(name_file + '  fail ! ! ! !')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,155 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+import pyvista as pv
+
+from data_loader import list_data_files, read_data_file
+from network_actors import JointGlyphs, TubeNetwork
+
+# 无需 Qt 窗口的离屏批量绘制：每个时间步保存一张 PNG，多个子进程各绘制时间轴的一段
+# 命令行运行方法：python frame_export.py 管路文件夹 时序文件夹 输出文件夹 [宽 高 进程数 属性编号]
+
+# 与界面一致的数值条标题与默认范围，属性编号依次为速度、压强、温度
+SCALAR_BAR_TITLE = ('velocity (mm/s)', 'pressure (Pa)', 'temperature (K)')
+SCALAR_BAR_RANGE = ((15, 90), (100, 800), (283, 363))
+
+
+# 子进程任务：建一个离屏绘图工具，依次绘制 jobs 中的各时间步，jobs 的每项为（时间步，数据文件路径，PNG 路径）
+# 返回每个 PNG 路径是否保存成功
+def render_chunk(path_network: str, coord_joint, endpoints, settings: dict, jobs: list) -> list:
+    network = TubeNetwork.load(path_network)
+    network.set_endpoints(endpoints)
+    glyph_joint = JointGlyphs(coord_joint, settings['joint_diameter'])
+    lut_data = pv.LookupTable(cmap='jet')
+    lut_data.scalar_range = settings['scalar_range']
+    glyph_joint.set_lookup_table(lut_data)
+    glyph_joint.set_scalar_visibility(True)
+
+    plotter = pv.Plotter(off_screen=True, window_size=settings['window_size'])
+    plotter.set_background(color='#E3EFFC')
+    plotter.add_actor(glyph_joint.actor, name='joint')
+    actor_tube = plotter.add_mesh(network.mesh, name='tube', show_edges=False, show_scalar_bar=False)
+    actor_tube.mapper.SetLookupTable(lut_data)
+    actor_tube.mapper.UseLookupTableScalarRangeOn()
+    actor_tube.mapper.SetScalarVisibility(True)
+    plotter.add_scalar_bar(title=settings['title'], lookup_table=lut_data, color='firebrick',
+                           title_font_size=15, label_font_size=10, width=0.5,
+                           vertical=False, position_x=0.3, position_y=0.1)
+    if settings['camera_position'] is None:
+        plotter.view_isometric()
+    else:
+        plotter.camera_position = settings['camera_position']
+
+    results = []
+    data_now = np.zeros(glyph_joint.num_joint)
+    for time_id, path_data, path_png in jobs:
+        try:
+            # 与界面一致：数据不足的关节置零
+            data_extract = read_data_file(path_data)[settings['id_attr']]
+            dim_extract = min(glyph_joint.num_joint, len(data_extract))
+            data_now[:] = 0
+            data_now[0:dim_extract] = data_extract[0:dim_extract]
+            glyph_joint.set_data(data_now)
+            network.set_frame(data_now)
+            plotter.add_text(str(time_id), position='upper_left', font_size=12, color='firebrick', name='time')
+            plotter.screenshot(path_png)
+            results.append((path_png, True))
+        except Exception as error:
+            results.append((path_png, False))
+    plotter.close()
+    return results
+
+
+# 离屏批量绘制器：管道网格先保存为临时 vtp 文件，子进程读取后各自绘制时间轴的一段
+class FrameExporter:
+    """批量导出时序帧：每个时间步一张 PNG，文件名与数据文件相同
+
+    endpoints 为 network 中各管道两端的关节编号（管道数，2），与 network.ids_tube 一一对应。
+    """
+
+    def __init__(self, network: TubeNetwork, coord_joint, endpoints, joint_diameter: float = 50,
+                 window_size: tuple = (1920, 1080), num_process: int = os.cpu_count() or 1):
+        self.network = network
+        self.coord_joint = np.asarray(coord_joint, dtype=float)
+        self.endpoints = np.asarray(endpoints, dtype=np.int32).reshape(-1, 2)
+        self.joint_diameter = joint_diameter
+        self.window_size = tuple(window_size)
+        self.num_process = max(int(num_process), 1)
+
+    # 返回（PNG 路径，是否成功）列表；callback(已完成的帧数, 总帧数) 在每段完成后调用
+    def export(self, path_folder_data: str, path_folder_out: str, id_attr: int = 0, scalar_range=None,
+               camera_position=None, callback=None) -> list:
+        os.makedirs(path_folder_out, exist_ok=True)
+        jobs = [(time_id, os.path.join(path_folder_data, name_file),
+                 os.path.join(path_folder_out, os.path.splitext(name_file)[0] + '.png'))
+                for time_id, name_file in list_data_files(path_folder_data)]
+        settings = {
+            'joint_diameter': self.joint_diameter,
+            'window_size': self.window_size,
+            'id_attr': id_attr,
+            'title': SCALAR_BAR_TITLE[id_attr],
+            'scalar_range': tuple(SCALAR_BAR_RANGE[id_attr] if scalar_range is None else scalar_range),
+            'camera_position': camera_position,
+        }
+        if not jobs:
+            return []
+        # 每个进程一段连续的时间步，绘图工具与网格在每个进程中只建一次
+        chunks = [chunk.tolist() for chunk in np.array_split(np.arange(len(jobs)), min(self.num_process, len(jobs)))]
+        results = [None] * len(chunks)
+        num_done = 0
+        with tempfile.TemporaryDirectory() as path_temp:
+            path_network = os.path.join(path_temp, 'network.vtp')
+            self.network.save(path_network)
+            if len(chunks) == 1:
+                results[0] = render_chunk(path_network, self.coord_joint, self.endpoints, settings, jobs)
+                num_done = len(jobs)
+                if callback is not None:
+                    callback(num_done, len(jobs))
+            else:
+                # 用 spawn 启动子进程，避免 fork 复制主进程中的 Qt 与 vtk 状态
+                with ProcessPoolExecutor(max_workers=len(chunks),
+                                         mp_context=multiprocessing.get_context('spawn')) as executor:
+                    futures = {executor.submit(render_chunk, path_network, self.coord_joint, self.endpoints, settings,
+                                               [jobs[i] for i in chunk]): j for j, chunk in enumerate(chunks)}
+                    for future in as_completed(futures):
+                        j = futures[future]
+                        results[j] = future.result()
+                        num_done += len(results[j])
+                        if callback is not None:
+                            callback(num_done, len(jobs))
+        return [result for results_chunk in results for result in results_chunk]
+
+
+# 命令行：按界面的默认参数读取管路、生成管道网格，再导出时序文件夹的所有时间步
+def main(argv: list):
+    import tube_geometry
+    from tube_table import TubeTable
+    from tube_topology import TubeTopology
+
+    path_folder_tube, path_folder_data, path_folder_out = argv[0:3]
+    # 未给出的参数取默认值
+    args = [int(arg) for arg in argv[3:7]]
+    width, height, num_process, id_attr = args + [1920, 1080, os.cpu_count() or 1, 0][len(args):]
+    coord_joint = pd.read_csv(os.path.join(path_folder_tube, 'joint_info.csv'), header=0,
+                              encoding='utf-8').fillna(0).to_numpy()[:, 1:4].astype(float)
+    line_tube = TubeTable.read(os.path.join(path_folder_tube, 'tube_info.csv'))
+    topology_tube = TubeTopology(line_tube.joints, len(coord_joint))
+    ids_tube, list_ctrl_points = line_tube.get_ctrl_points(coord_joint)
+    network = tube_geometry.build_network(ids_tube, tube_geometry.eval_centerlines(list_ctrl_points, 0.01, 1.0))
+    network.set_radius(20)
+
+    exporter = FrameExporter(network, coord_joint, topology_tube.endpoints[network.ids_tube], 50, (width, height),
+                             num_process)
+    results = exporter.export(path_folder_data, path_folder_out, id_attr,
+                              callback=lambda num_done, num_total: print('{} / {}'.format(num_done, num_total)))
+    for path_png, flag in results:
+        if not flag:
+            print(os.path.basename(path_png) + '  fail ! ! ! !')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,319 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pyvista as pv
+from vtkmodules.util.numpy_support import numpy_to_vtk
+from vtkmodules.vtkCommonDataModel import vtkCellArray
+from vtkmodules.vtkFiltersCore import vtkMassProperties, vtkPolyDataNormals, vtkQuadricClustering
+from vtkmodules.vtkFiltersCore import vtkQuadricDecimation
+
+from geometry_cache import GeometryCache
+from jobs import Job
+
+# 二进制 stl 的三角形记录，共50字节：法向、3个顶点坐标、属性字节数
+DTYPE_STL_FACET = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+# 每次读取的三角形数，每读完一段报告一次进度、检查一次是否取消
+NUM_FACET_CHUNK: int = 1 << 20
+# 顶点聚类的网格单元数上限：vtkQuadricClustering 为每个单元分配内存（约80字节）
+NUM_BIN_MAX: int = 1 << 22
+# 顶点聚类调整网格划分的最多次数，以及可接受的三角形数下限（占 num_face_max 的比例）
+NUM_CLUSTERING_PASS: int = 6
+RATIO_FACE_MIN: float = 0.9
+# 处理后的油箱网格的二进制格式（.tank），文件头之后依次为：
+# 点坐标 float32 (n, 3)、点法向 float32 (n, 3)、三角形偏移 int32 (m + 1)、三角形顶点编号 int32 (3m)
+DTYPE_TANK_HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('num_point', '<u8'), ('num_face', '<u8')])
+MAGIC_TANK: bytes = b'FTNK'
+VERSION_TANK: int = 1
+
+
+# 文件大小恰好等于 84 + 50 × 三角形数，则为二进制 stl，否则按 ASCII stl 读取
+def is_binary_stl(path_file: str) -> bool:
+    size_file = os.path.getsize(path_file)
+    if size_file < 84:
+        return False
+    with open(path_file, 'rb') as f:
+        f.seek(80)
+        num_facet = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+    return size_file == 84 + 50 * num_facet
+
+
+# 分段读取二进制 stl，callback(已完成比例) 返回 False 时取消读取并返回 None
+def read_stl_binary(path_file: str, callback=None):
+    with open(path_file, 'rb') as f:
+        f.seek(80)
+        num_facet = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+        vertices = np.empty((num_facet, 3, 3), dtype=np.float32)
+        for start in range(0, num_facet, NUM_FACET_CHUNK):
+            chunk = np.fromfile(f, dtype=DTYPE_STL_FACET, count=min(NUM_FACET_CHUNK, num_facet - start))
+            vertices[start:start + len(chunk)] = chunk['vertices']
+            if (callback is not None) and (not callback((start + len(chunk)) / num_facet)):
+                return None
+    return merge_vertices(vertices.reshape(-1, 3))
+
+
+# 合并坐标相同的顶点，按首次出现的顺序编号，并去掉退化的三角形，结果与 pv.read（vtkSTLReader）一致
+# 坐标的二进制位分两次哈希编码：先编码 (x, y)，再编码（(x, y) 的编号, z）
+def merge_vertices(vertices) -> pv.PolyData:
+    # 加0使 -0.0 变为 0.0，二者按同一坐标合并
+    vertices = vertices + np.float32(0)
+    bits = vertices.view(np.uint32).astype(np.uint64)
+    ids_xy, _ = pd.factorize((bits[:, 0] << np.uint64(32)) | bits[:, 1])
+    ids_point, _ = pd.factorize((ids_xy.astype(np.uint64) << np.uint64(32)) | bits[:, 2])
+    # 每个顶点首次出现的位置：倒序赋值，靠前的位置最后写入
+    first = np.empty(ids_point.max() + 1 if len(ids_point) else 0, dtype=np.int64)
+    first[ids_point[::-1]] = np.arange(len(ids_point) - 1, -1, -1)
+    faces = ids_point.reshape(-1, 3)
+    mask = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+    return pv.PolyData.from_regular_faces(vertices[first], faces[mask])
+
+
+# 顶点聚类的网格划分：每个网格单元约生成2个三角形，单元边长 s 满足 2 × 表面积 / s² ≈ num_face_max
+# 各方向的单元数按网格在该方向的实际尺寸计算，扁平、细长的模型在短边方向只分很少的单元
+def get_clustering_divisions(mesh: pv.PolyData, num_face_max: int, divisions_max=None) -> np.ndarray:
+    mass = vtkMassProperties()
+    mass.SetInputData(mesh)
+    mass.Update()
+    size_bin = np.sqrt(2 * mass.GetSurfaceArea() / num_face_max)
+    extent = np.subtract(mesh.bounds[1::2], mesh.bounds[0::2])
+    if divisions_max is None:
+        divisions_max = get_divisions_max(mesh)
+    return scale_divisions(extent / max(size_bin, 1e-12), 1, divisions_max)
+
+
+# 各方向有意义的单元数上限：该方向上不同坐标值的个数，再细分也不会多出三角形
+# 例如细分后的圆柱，沿轴向只有少数几层顶点，轴向的单元应让给截面方向
+def get_divisions_max(mesh: pv.PolyData) -> np.ndarray:
+    points = np.asarray(mesh.points)
+    return np.array([max(len(np.unique(points[:, k])), 1) for k in range(3)])
+
+
+# 各方向的单元数同乘 scale（按实际尺寸的比例不变），不超过 divisions_max；单元数超过上限时各方向等比例减少
+def scale_divisions(divisions, scale: float, divisions_max) -> np.ndarray:
+    divisions = np.maximum(np.ceil(np.asarray(divisions, dtype=float) * scale), 1)
+    divisions = np.minimum(divisions, divisions_max)
+    if np.prod(divisions) > NUM_BIN_MAX:
+        divisions = np.maximum(np.floor(divisions * (NUM_BIN_MAX / np.prod(divisions)) ** (1 / 3)), 1)
+    return divisions.astype(int)
+
+
+# 顶点聚类简化到不超过 num_face_max 个三角形：三角形数与单元数的关系因模型而异，
+# 因此按前两次的结果在对数坐标下插值，反复调整网格划分，直到落在 [RATIO_FACE_MIN × num_face_max, num_face_max] 内
+# 返回不超出的结果中三角形最多的；每次都超出时，在超出最少的结果上用二次误差边折叠简化到 num_face_max
+def cluster_mesh(mesh: pv.PolyData, num_face_max: int, callback=None):
+    divisions_max = get_divisions_max(mesh)
+    divisions_base = get_clustering_divisions(mesh, num_face_max, divisions_max).astype(float)
+    # 三角形数约与 scale 的 exponent 次方成正比，初值按表面上均匀分布取2
+    scale, exponent = 1.0, 2.0
+    mesh_under, mesh_over, divisions_tried = None, None, []
+    points_log = []
+    for i_pass in range(NUM_CLUSTERING_PASS):
+        divisions = scale_divisions(divisions_base, scale, divisions_max)
+        if any(np.array_equal(divisions, divisions_old) for divisions_old in divisions_tried):
+            break
+        divisions_tried.append(divisions)
+        callback_pass = None
+        if callback is not None:
+            callback_pass = lambda ratio, i_pass=i_pass: callback((i_pass + ratio) / (NUM_CLUSTERING_PASS + 1))
+        mesh_out = run_filter(vtkQuadricClustering(), mesh, callback_pass, divisions)
+        if mesh_out is None:
+            return None
+        num_face = mesh_out.n_cells
+        if num_face <= num_face_max:
+            if (mesh_under is None) or (num_face > mesh_under.n_cells):
+                mesh_under = mesh_out
+            if num_face >= RATIO_FACE_MIN * num_face_max:
+                break
+        elif (mesh_over is None) or (num_face < mesh_over.n_cells):
+            mesh_over = mesh_out
+        points_log.append((np.log(scale), np.log(max(num_face, 1))))
+        if len(points_log) >= 2:
+            (x0, y0), (x1, y1) = points_log[-2:]
+            if (x1 != x0) and (y1 != y0):
+                exponent = float(np.clip((y1 - y0) / (x1 - x0), 0.25, 4))
+        # 目标取区间中点，避免在上限两侧来回
+        target = (1 + RATIO_FACE_MIN) / 2 * num_face_max
+        scale *= (target / max(num_face, 1)) ** (1 / exponent)
+    if mesh_under is not None:
+        return mesh_under
+    # 聚类的结果比原网格小得多，在其上做边折叠
+    callback_last = None
+    if callback is not None:
+        callback_last = lambda ratio: callback((NUM_CLUSTERING_PASS + ratio) / (NUM_CLUSTERING_PASS + 1))
+    return decimate_to(mesh_over, num_face_max, callback_last)
+
+
+# 二次误差边折叠简化到不超过 num_face_max 个三角形；按比例折叠可能略有超出，超出时按剩余比例再折叠
+def decimate_to(mesh: pv.PolyData, num_face_max: int, callback=None):
+    while (mesh is not None) and (mesh.n_cells > num_face_max):
+        num_face_before = mesh.n_cells
+        algorithm = vtkQuadricDecimation()
+        algorithm.SetTargetReduction(1 - num_face_max / mesh.n_cells)
+        mesh = run_filter(algorithm, mesh, callback)
+        if (mesh is not None) and (mesh.n_cells >= num_face_before):
+            break
+    return mesh
+
+
+# 把网格简化到不超过 num_face_max 个三角形，num_face_max ≤ 0 或三角形数未超出时原样返回
+# method：'clustering' 顶点聚类（快，适合大模型）；'decimation' 二次误差边折叠（慢，质量更好）
+# callback(已完成比例) 返回 False 时取消并返回 None
+def decimate_mesh(mesh: pv.PolyData, num_face_max: int, method: str = 'clustering', callback=None):
+    if (num_face_max <= 0) or (mesh.n_cells <= num_face_max):
+        return mesh
+    if method == 'clustering':
+        return cluster_mesh(mesh, num_face_max, callback)
+    if method == 'decimation':
+        return decimate_to(mesh, num_face_max, callback)
+    return mesh
+
+
+def run_filter(algorithm, mesh: pv.PolyData, callback=None, divisions=None):
+    if divisions is not None:
+        algorithm.AutoAdjustNumberOfDivisionsOff()
+        algorithm.SetNumberOfDivisions(*divisions)
+    algorithm.SetInputData(mesh)
+    if callback is not None:
+        def on_progress(obj, event):
+            if not callback(obj.GetProgress()):
+                obj.SetAbortExecuteAndUpdateTime()
+        algorithm.AddObserver('ProgressEvent', on_progress)
+    algorithm.Update()
+    if algorithm.GetAbortExecute():
+        return None
+    return pv.wrap(algorithm.GetOutput())
+
+
+# 保存为 .tank 文件：单位换算与简化都已完成，并预先计算点法向
+def save_tank(mesh: pv.PolyData, path_file: str):
+    if not mesh.is_all_triangles:
+        mesh = mesh.triangulate()
+    algorithm = vtkPolyDataNormals()
+    algorithm.SetInputData(mesh)
+    # 不拆分尖锐边、不调整三角形朝向，保证点与三角形不变
+    algorithm.SplittingOff()
+    algorithm.ConsistencyOff()
+    algorithm.ComputeCellNormalsOff()
+    algorithm.Update()
+    normals = pv.wrap(algorithm.GetOutput()).point_data['Normals']
+    faces = mesh.regular_faces
+    header = np.array([(MAGIC_TANK, VERSION_TANK, mesh.n_points, len(faces))], dtype=DTYPE_TANK_HEADER)
+    with open(path_file, 'wb') as f:
+        header.tofile(f)
+        np.ascontiguousarray(mesh.points, dtype=np.float32).tofile(f)
+        np.ascontiguousarray(normals, dtype=np.float32).tofile(f)
+        np.arange(0, 3 * len(faces) + 1, 3, dtype=np.int32).tofile(f)
+        np.ascontiguousarray(faces, dtype=np.int32).tofile(f)
+
+
+# 读取 .tank 文件：各数组都是文件的内存映射，直接作为 PolyData 的点、法向与单元数组，不复制数据
+# 映射为写时复制（mode='c'），修改网格不会改动文件
+def load_tank(path_file: str) -> pv.PolyData:
+    header = np.fromfile(path_file, dtype=DTYPE_TANK_HEADER, count=1)[0]
+    if (not header['magic'] == MAGIC_TANK) or (not header['version'] == VERSION_TANK):
+        raise ValueError('不是 .tank 文件或版本不一致')
+    num_point, num_face = int(header['num_point']), int(header['num_face'])
+    offset = DTYPE_TANK_HEADER.itemsize
+    arrays = []
+    for dtype, shape in ((np.float32, (num_point, 3)), (np.float32, (num_point, 3)), (np.int32, (num_face + 1,)),
+                         (np.int32, (3 * num_face,))):
+        arrays.append(np.memmap(path_file, dtype=dtype, mode='c', offset=offset, shape=shape))
+        offset += arrays[-1].nbytes
+    points, normals, offsets, connectivity = arrays
+
+    mesh = pv.PolyData()
+    mesh.points = points
+    # 32 位的偏移与编号数组直接作为 vtkCellArray 的存储
+    polys = vtkCellArray()
+    polys.SetData(numpy_to_vtk(offsets, deep=False), numpy_to_vtk(connectivity, deep=False))
+    mesh.SetPolys(polys)
+    mesh.point_data['Normals'] = normals
+    mesh.GetPointData().SetActiveNormals('Normals')
+    return mesh
+
+
+# 转换器：读取 stl，换算单位、简化后保存为 .tank 文件
+def convert_stl(path_stl: str, path_tank: str, scale: float = 1, num_face_max: int = 0,
+                method: str = 'clustering'):
+    mesh = FueltankLoader(path_stl, scale, num_face_max, method).work()
+    save_tank(mesh, path_tank)
+
+
+# 油箱网格缓存：键为 stl 文件的路径、大小、修改时间与处理参数，值为 .tank 文件
+# 大文件计算内容哈希需要数秒，因此只按文件状态判断是否改变
+class FueltankCache(GeometryCache):
+    """磁盘上的油箱网格缓存，读取时内存映射"""
+    SUFFIX: str = '.tank'
+
+    @staticmethod
+    def get_stat(path_file: str) -> str:
+        stat = os.stat(path_file)
+        return '{}|{}|{}'.format(os.path.abspath(path_file), stat.st_size, stat.st_mtime_ns)
+
+    @staticmethod
+    def read(path_file: str):
+        return load_tank(path_file)
+
+    @staticmethod
+    def write(value, path_file: str):
+        save_tank(value, path_file)
+
+    # .tank 文件的大小：文件头、点与法向（float32）、偏移与编号（int32）；非三角形单元按三角化前的单元数估计
+    @staticmethod
+    def get_nbytes(value):
+        return DTYPE_TANK_HEADER.itemsize + 24 * value.n_points + 16 * value.n_cells + 4
+
+
+# 在 QThread 里读取油箱 stl：读取、单位换算、简化，每一步报告进度，可随时取消
+class FueltankLoader(Job):
+    """运行在 QThread 里的油箱模型读取器，进度为（百分比，100，当前步骤），结果为网格，取消时为 None"""
+
+    def __init__(self, path_file: str, scale: float = 1, num_face_max: int = 0, method: str = 'clustering',
+                 cache: FueltankCache = None):
+        super().__init__()
+        self.path_file = path_file
+        self.scale = scale
+        self.num_face_max = num_face_max
+        self.method = method
+        # 给出缓存时，命中则直接内存映射读取，未命中则处理完成后写入缓存
+        self.cache = cache
+
+    def work(self):
+        self.report_percent(0, '读取')
+        # .tank 文件已换算单位并简化，直接读取
+        if self.path_file.lower().endswith(FueltankCache.SUFFIX):
+            return load_tank(self.path_file)
+        key_cache = None
+        if self.cache is not None:
+            key_cache = self.cache.get_key(FueltankCache.get_stat(self.path_file),
+                                           {'scale': self.scale, 'num_face_max': self.num_face_max,
+                                            'method': self.method})
+            mesh = self.cache.load(key_cache)
+            if mesh is not None:
+                return mesh
+        # 二进制 stl 分段读取；ASCII stl 交给 pv.read，读取过程中无法取消
+        if is_binary_stl(self.path_file):
+            mesh = read_stl_binary(self.path_file, lambda ratio: self.report_percent(60 * ratio, '读取'))
+        else:
+            mesh = pv.read(self.path_file)
+        if (mesh is None) or (not self.report_percent(60, '单位换算')):
+            return None
+        if not self.scale == 1:
+            mesh.points *= self.scale
+        mesh = decimate_mesh(mesh, self.num_face_max, self.method,
+                             lambda ratio: self.report_percent(60 + 40 * ratio, '简化'))
+        if (mesh is None) or (not self.report_percent(100, '完成')):
+            return None
+        if key_cache is not None:
+            self.cache.save(key_cache, mesh)
+        return mesh
+
+    # 按百分比报告进度，返回是否继续
+    def report_percent(self, percent: float, stage: str) -> bool:
+        return self.report(int(percent), 100, stage)
+
+
+# 运行方法：python fueltank_mesh.py 输入.stl 输出.tank [单位换算系数] [三角形数上限]
+if __name__ == '__main__':
+    convert_stl(sys.argv[1], sys.argv[2], *[float(arg) for arg in sys.argv[3:4]],
+                *[int(arg) for arg in sys.argv[4:5]])
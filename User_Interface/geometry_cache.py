@@ -0,0 +1,109 @@
+import os
+import hashlib
+
+from network_actors import TubeNetwork
+
+# 缓存格式版本，网格生成方式改变时需要加一，使旧缓存失效
+CACHE_VERSION: int = 4
+
+
+# 计算多个文件内容的哈希值，文件内容不变则哈希值不变
+def hash_files(paths: list) -> str:
+    hasher = hashlib.sha256()
+    for path_file in paths:
+        with open(path_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(chunk)
+        # 分隔不同文件，避免两个文件内容拼接后碰巧相同
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+# 管路几何缓存：键为输入文件哈希与网格参数的哈希，值为合并后的管道网格（二进制 vtp）
+class GeometryCache:
+    """磁盘上的管路几何缓存，总大小超过 max_bytes 时删除最久未使用的缓存"""
+    # 缓存文件的扩展名，子类可改为其他格式
+    SUFFIX: str = '.vtp'
+
+    def __init__(self, root: str, max_bytes: int = 2 << 30):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    # settings 为影响网格的全部参数，例如管道半径、取样密度
+    @staticmethod
+    def get_key(hash_input: str, settings: dict) -> str:
+        text = '{}|{}|{}'.format(CACHE_VERSION, hash_input, sorted(settings.items()))
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.root, key + self.SUFFIX)
+
+    # 命中则返回管道网格，并刷新修改时间作为最近使用时间；未命中或文件损坏返回 None
+    def load(self, key: str):
+        path_file = self.get_path(key)
+        if not os.path.exists(path_file):
+            return None
+        try:
+            value = self.read(path_file)
+            os.utime(path_file)
+            return value
+        except Exception as error:
+            return None
+
+    # 单个缓存大于 self.max_bytes 时不保存：保存后会被立即删除，每次读取都白白写一遍
+    def save(self, key: str, value):
+        nbytes = self.get_nbytes(value)
+        if (nbytes is not None) and (nbytes > self.max_bytes):
+            return
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            # 先写临时文件再改名，避免中途退出留下不完整的缓存
+            path_temp = os.path.join(self.root, key + '.tmp' + self.SUFFIX)
+            self.write(value, path_temp)
+            if os.path.getsize(path_temp) > self.max_bytes:
+                os.remove(path_temp)
+                return
+            os.replace(path_temp, self.get_path(key))
+            self.evict()
+        except Exception as error:
+            return
+
+    # 缓存文件大小的估计（字节），未知时返回 None，写入后再检查；子类按自己的格式重写
+    @staticmethod
+    def get_nbytes(value):
+        return None
+
+    # 读写单个缓存文件，子类按自己的格式重写
+    @staticmethod
+    def read(path_file: str):
+        return TubeNetwork.load(path_file)
+
+    @staticmethod
+    def write(value, path_file: str):
+        value.save(path_file)
+
+    # 按最近使用时间从旧到新删除，直到总大小不超过 self.max_bytes
+    def evict(self):
+        entries = []
+        for name_file in os.listdir(self.root):
+            if name_file.endswith(self.SUFFIX) and not name_file.endswith('.tmp' + self.SUFFIX):
+                path_file = os.path.join(self.root, name_file)
+                stat = os.stat(path_file)
+                entries.append((stat.st_mtime, stat.st_size, path_file))
+        entries.sort()
+        size_total = sum(entry[1] for entry in entries)
+        for mtime, size, path_file in entries:
+            if size_total <= self.max_bytes:
+                break
+            try:
+                os.remove(path_file)
+                size_total -= size
+            except OSError as error:
+                continue
+
+    def clear(self):
+        if not os.path.exists(self.root):
+            return
+        for name_file in os.listdir(self.root):
+            if name_file.endswith(self.SUFFIX):
+                os.remove(os.path.join(self.root, name_file))
@@ -0,0 +1,115 @@
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+
+# 后台任务：耗时的读取放在 QThread 里运行，通过信号报告进度、部分结果与最终结果，主线程保持响应
+class Job(QObject):
+    """运行在 QThread 里的后台任务：子类实现 self.work()，返回最终结果，取消时返回 None
+
+    self.work() 中用 self.report() 报告进度，其返回值为是否继续；可先用 self.partial 发出部分结果，供主线程先行显示。
+    """
+    progress = pyqtSignal(int, int, str)  # （已完成数，总数，当前步骤）
+    partial = pyqtSignal(object)  # 部分结果，内容由子类决定
+    loaded = pyqtSignal(object)  # 最终结果，取消时为 None
+    failed = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.flag_cancel: bool = False
+
+    # 由主线程直接调用（不经过信号），读取线程在下一次报告进度时停止
+    def cancel(self):
+        self.flag_cancel = True
+
+    def run(self):
+        try:
+            result = self.work()
+        except Exception as error:
+            self.failed.emit(str(error))
+            return
+        self.loaded.emit(result)
+
+    def work(self):
+        raise NotImplementedError
+
+    # 报告进度，返回是否继续
+    def report(self, num_done: int, num_total: int, stage: str = '') -> bool:
+        self.progress.emit(int(num_done), int(num_total), stage)
+        return not self.flag_cancel
+
+
+# 把一个函数作为后台任务：self.work() 调用 function(job, *args)，函数通过 job.report() 与 job.partial 报告
+class FunctionJob(Job):
+    """以函数为内容的后台任务"""
+
+    def __init__(self, function, *args):
+        super().__init__()
+        self.function = function
+        self.args = args
+
+    def work(self):
+        return self.function(self, *self.args)
+
+
+# 按名称管理后台任务，每个任务一个 QThread，同名任务同一时间只运行一个
+class JobRunner(QObject):
+    """后台任务管理器
+
+    任务的 loaded、failed 信号的槽函数中先调用 self.finish(name, self.sender())：回收线程，
+    并判断发出信号的任务是否仍是该名称当前的任务（已被取消并清除的任务，其结果应丢弃）。
+    self.flag_background 为 False 时在主线程中直接运行任务，信号直接调用槽函数，用于脚本与测试。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.flag_background: bool = True
+        # {名称: （任务, 线程）}，在主线程中运行的任务线程为 None
+        self.jobs = {}
+
+    def is_running(self, name: str) -> bool:
+        return name in self.jobs
+
+    # job 是否为该名称当前的任务，用于丢弃已取消的任务迟到的信号
+    def is_current(self, name: str, job) -> bool:
+        return (name in self.jobs) and (self.jobs[name][0] is job)
+
+    # 启动任务；同名任务正在运行时不启动，返回 False
+    def start(self, name: str, job: Job) -> bool:
+        if name in self.jobs:
+            return False
+        if not self.flag_background:
+            self.jobs[name] = (job, None)
+            job.run()
+            # 槽函数未调用 self.finish() 时也清除
+            if self.is_current(name, job):
+                self.jobs.pop(name)
+            return True
+        thread = QThread()
+        job.moveToThread(thread)
+        thread.started.connect(job.run)
+        self.jobs[name] = (job, thread)
+        thread.start()
+        return True
+
+    # 任务结束时在槽函数中调用：回收线程，返回 job 是否仍是该名称当前的任务
+    def finish(self, name: str, job) -> bool:
+        if not self.is_current(name, job):
+            return False
+        self.clear(name)
+        return True
+
+    def cancel(self, name: str):
+        if name in self.jobs:
+            self.jobs[name][0].cancel()
+
+    # 清除任务并等待其线程结束；之后该任务的信号都会被丢弃
+    def clear(self, name: str):
+        job, thread = self.jobs.pop(name, (None, None))
+        if thread is not None:
+            thread.quit()
+            thread.wait()
+
+    # 取消并清除所有任务，关闭窗口时调用
+    def clear_all(self):
+        for name in list(self.jobs):
+            self.cancel(name)
+            self.clear(name)
@@ -0,0 +1,166 @@
+import numpy as np
+import pyvista as pv
+from vtkmodules.vtkCommonDataModel import vtkDataSetAttributes
+from vtkmodules.vtkRenderingCore import vtkActor, vtkGlyph3DMapper
+# 注册 OpenGL 实现：未导入时 vtkGlyph3DMapper 是抽象的基类，在创建绘图工具前建立的关节无法绘制
+import vtkmodules.vtkRenderingOpenGL2
+
+
+# 所有关节用一个点云 + 一个 glyph mapper 绘制，整个管路只有一个关节 actor
+class JointGlyphs:
+    """关节渲染器：点云的每个点是一个关节，mapper 在每个点上实例化同一个 cube"""
+
+    def __init__(self, coord_joint, joint_diameter: float):
+        coord_joint = np.asarray(coord_joint, dtype=float)
+        self.num_joint: int = coord_joint.shape[0]
+        # 点云：每个点一个关节，'joint_id' 用于拾取后找回关节编号，'data' 是每帧更新的标量
+        self.cloud = pv.PolyData(coord_joint)
+        self.cloud['joint_id'] = np.arange(self.num_joint, dtype=np.int32)
+        self.cloud['data'] = np.zeros(self.num_joint)
+        self.cloud.set_active_scalars('data')
+        # 单位 cube，由 mapper 的缩放系数控制边长，修改边长无需重建网格
+        self.source = pv.Cube(x_length=1, y_length=1, z_length=1)
+        # 细节层次：0 为带边框的 cube，1 为不带边框的 cube，2 为一个点（关节在屏幕上很小时）
+        self.sources_lod = [self.source, self.source, pv.PolyData(np.zeros((1, 3)))]
+        self.level: int = 0
+
+        self.mapper = vtkGlyph3DMapper()
+        self.mapper.SetInputData(self.cloud)
+        self.mapper.SetSourceData(self.source)
+        self.mapper.SetScaleModeToNoDataScaling()
+        self.mapper.SetScaleFactor(joint_diameter)
+        self.mapper.OrientOff()
+        self.mapper.SetScalarModeToUsePointFieldData()
+        self.mapper.SelectColorArray('data')
+        self.mapper.SetLookupTable(pv.LookupTable(cmap='jet'))
+        self.mapper.SetScalarVisibility(False)
+
+        self.actor = vtkActor()
+        self.actor.SetMapper(self.mapper)
+        self.actor.GetProperty().SetColor(pv.Color(pv.global_theme.color).float_rgb)
+        self.actor.GetProperty().SetEdgeVisibility(True)
+        self.actor.GetProperty().SetLineWidth(1)
+        self.actor.GetProperty().SetPointSize(3)
+
+    def set_diameter(self, joint_diameter: float):
+        self.mapper.SetScaleFactor(joint_diameter)
+
+    def set_level(self, level: int):
+        level = min(max(level, 0), len(self.sources_lod) - 1)
+        if level == self.level:
+            return
+        self.level = level
+        self.mapper.SetSourceData(self.sources_lod[level])
+        self.actor.GetProperty().SetEdgeVisibility(level == 0)
+
+    def set_scalar_visibility(self, flag: bool):
+        self.mapper.SetScalarVisibility(flag)
+
+    # 使用外部的颜色映射表，数值范围也由映射表决定，修改映射表即可，无需逐帧设置
+    def set_lookup_table(self, lookup_table):
+        self.mapper.SetLookupTable(lookup_table)
+        self.mapper.UseLookupTableScalarRangeOn()
+
+    # 每帧只上传一次标量：直接写入点云的 'data' 数组，再标记一次 Modified
+    def set_data(self, data_now):
+        self.cloud['data'][:] = data_now[:self.num_joint]
+        self.cloud.GetPointData().GetArray('data').Modified()
+        self.cloud.Modified()
+
+    def get_center(self, id_joint: int):
+        return self.cloud.points[id_joint]
+
+
+# 所有管道的表面合并成一个 PolyData，整个管路只有一个管道 actor 和一段连续的标量数组
+class TubeNetwork:
+    """管道渲染器：按 CSR 方式记录每根管道在合并网格中的点范围
+
+    第 k 根管道的点为 mesh.points[offsets[k]:offsets[k + 1]]，其单元由单元数组 'tube_id' 标记。
+    点数组 't' 为各点沿所属管道弧长的归一化参数（见 tube_geometry.get_arc_parameters），用于逐帧插值。
+    若网格带有 'center' 与 'direction' 点数组（见 tube_geometry.sweep_tubes_unit），
+    则表面点 = center + 半径 × direction，修改半径只需 self.set_radius()，无需重新生成网格。
+    """
+
+    def __init__(self, mesh: pv.PolyData, ids_tube):
+        # mesh 的点数组与单元数组 'tube_id' 为网格内的管道序号 k，同一管道的点连续，且按 k 递增排列
+        # ids_tube[k] 为第 k 根管道在 tube_info.csv 中的行号
+        self.mesh = mesh
+        self.ids_tube = np.asarray(ids_tube, dtype=np.int32)
+        self.num_tube: int = len(self.ids_tube)
+        self.offsets = np.searchsorted(self.mesh.point_data['tube_id'],
+                                       np.arange(self.num_tube + 1)).astype(np.int64)
+        # 标量只用于着色，float32 即可，逐帧写入的数据量减半
+        self.mesh.point_data['data'] = np.zeros(self.mesh.n_points, dtype=np.float32)
+        self.mesh.set_active_scalars('data')
+        if 'TubeNormals' in self.mesh.point_data:
+            self.mesh.GetPointData().SetActiveNormals('TubeNormals')
+        # 隐藏管道用的 ghost 数组，0 为显示
+        self.mesh.cell_data[vtkDataSetAttributes.GhostArrayName()] = np.zeros(self.mesh.n_cells, dtype=np.uint8)
+        # 逐帧更新标量用：每个点所属管道两端的关节编号，以及两个预先分配的缓冲区，详见 self.set_frame()
+        self.joints_point = None
+        self.buffers = None
+        self.buffer_joint = None
+
+    # 保存为二进制 vtp 文件，ids_tube 一并存入 field_data
+    def save(self, path_file: str):
+        self.mesh.field_data['ids_tube'] = self.ids_tube
+        self.mesh.save(path_file, binary=True)
+
+    # 从 self.save() 保存的文件读取，不重新生成网格
+    @classmethod
+    def load(cls, path_file: str):
+        mesh = pv.read(path_file)
+        return cls(mesh, mesh.field_data['ids_tube'])
+
+    def is_scalable(self) -> bool:
+        return ('center' in self.mesh.point_data) and ('direction' in self.mesh.point_data)
+
+    # 原地修改所有管道的半径：表面点 = center + 半径 × direction，法向不变
+    def set_radius(self, radius: float):
+        points = self.mesh.points
+        np.multiply(self.mesh.point_data['direction'], radius, out=points)
+        points += self.mesh.point_data['center']
+        self.mesh.GetPoints().Modified()
+        self.mesh.Modified()
+
+    # 第 k 根管道的点标量，是合并后标量数组的一个视图，可直接写入
+    def get_data(self, k: int):
+        return self.mesh.point_data['data'][self.offsets[k]:self.offsets[k + 1]]
+
+    # 绑定各管道两端的关节编号（管道数，2），按网格内的管道序号 k 排列
+    def set_endpoints(self, endpoints):
+        endpoints = np.maximum(np.asarray(endpoints, dtype=np.int32).reshape(-1, 2), 0)
+        # 编号存为 np.intp，take 无需先把编号转换为 intp 的临时数组
+        self.joints_point = np.ascontiguousarray(endpoints[self.mesh.point_data['tube_id']].T, dtype=np.intp)
+        self.buffers = np.empty((2, self.mesh.n_points), dtype=np.float32)
+        # 关节值的 float32 副本，关节数改变时才重新分配
+        self.buffer_joint = np.empty(0, dtype=np.float32)
+
+    # 一帧的标量：各点取所属管道两端关节的值 a、b，按弧长参数 t 计算 a + (b − a) × t，全部写入同一个标量数组
+    # 关节值先转为 float32 写入预先分配的数组（take 的输入与输出类型不同时，numpy 会按点数分配临时数组），
+    # 之后只有两次 take 与三次原地运算，不分配新数组，最后只标记一次 Modified
+    # 关节编号在 self.set_endpoints() 中已限定为非负，mode='clip' 免去越界检查
+    def set_frame(self, data_joint):
+        data = self.mesh.point_data['data']
+        start, stop = self.buffers
+        if len(self.buffer_joint) != len(data_joint):
+            self.buffer_joint = np.empty(len(data_joint), dtype=np.float32)
+        self.buffer_joint[:] = data_joint
+        np.take(self.buffer_joint, self.joints_point[0], out=start, mode='clip')
+        np.take(self.buffer_joint, self.joints_point[1], out=stop, mode='clip')
+        np.subtract(stop, start, out=stop)
+        np.multiply(stop, self.mesh.point_data['t'], out=stop)
+        np.add(start, stop, out=data)
+        self.set_modified()
+
+    # 写完标量后标记一次 Modified
+    def set_modified(self):
+        self.mesh.point_data.GetArray('data').Modified()
+        self.mesh.Modified()
+
+    def set_visibility(self, ids, flag: bool):
+        ghost = self.mesh.cell_data[vtkDataSetAttributes.GhostArrayName()]
+        mask = np.isin(self.mesh.cell_data['tube_id'], ids)
+        ghost[mask] = 0 if flag else vtkDataSetAttributes.HIDDENCELL
+        self.mesh.cell_data.GetArray(vtkDataSetAttributes.GhostArrayName()).Modified()
+        self.mesh.Modified()
@@ -0,0 +1,133 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import numpy as np
+import pyvista as pv
+from PyQt5.QtCore import QObject, pyqtSignal
+from vtkmodules.util.numpy_support import numpy_to_vtkIdTypeArray, vtk_to_numpy
+from vtkmodules.vtkCommonDataModel import vtkCellArray
+
+import tube_geometry
+from network_actors import TubeNetwork
+
+# 每个子进程任务处理的管道数
+NUM_TUBE_CHUNK: int = 1000
+# 子进程传回的点数组
+NAMES_POINT = ('TubeNormals', 'center', 'direction', 'tube_id', 't')
+
+
+# vtkCellArray 转为（offsets, connectivity）两个 numpy 数组
+def get_cell_arrays(cells: vtkCellArray):
+    return (vtk_to_numpy(cells.GetOffsetsArray()).astype(np.int64),
+            vtk_to_numpy(cells.GetConnectivityArray()).astype(np.int64))
+
+
+# 拼接多个（offsets, connectivity），各自的点编号加上对应的点偏移量
+def concat_cell_arrays(list_cells: list, list_base_point: list) -> vtkCellArray:
+    list_offsets, list_connectivity = [np.zeros(1, dtype=np.int64)], []
+    num_connectivity = 0
+    for (offsets, connectivity), base_point in zip(list_cells, list_base_point):
+        list_offsets.append(offsets[1:] + num_connectivity)
+        list_connectivity.append(connectivity + base_point)
+        num_connectivity += len(connectivity)
+    cells = vtkCellArray()
+    cells.SetData(numpy_to_vtkIdTypeArray(np.concatenate(list_offsets), deep=True),
+                  numpy_to_vtkIdTypeArray(np.concatenate(list_connectivity), deep=True))
+    return cells
+
+
+# 子进程任务：计算一段管道的中心线并扫掠、合并，只返回 numpy 数组（可直接序列化传回主进程）
+def build_chunk(list_ctrl_points: list, delta: float, tolerance: float, num_sides: int) -> dict:
+    list_points = tube_geometry.eval_centerlines(list_ctrl_points, delta, tolerance)
+    network = tube_geometry.build_network(list(range(len(list_ctrl_points))), list_points, num_sides)
+    mesh = network.mesh
+    # vtk 中多边形与三角带分开存放，单元编号先多边形后三角带（vtkTubeFilter 的端盖也是三角带）
+    num_polys = mesh.GetNumberOfPolys()
+    return {
+        'points': np.asarray(mesh.points),
+        'point_data': {name: np.asarray(mesh.point_data[name]) for name in NAMES_POINT if name in mesh.point_data},
+        'polys': get_cell_arrays(mesh.GetPolys()),
+        'strips': get_cell_arrays(mesh.GetStrips()),
+        'tube_id_polys': np.asarray(mesh.cell_data['tube_id'][:num_polys]),
+        'tube_id_strips': np.asarray(mesh.cell_data['tube_id'][num_polys:]),
+        'ids_tube': network.ids_tube,
+        'centerlines': list_points,
+    }
+
+
+# 多进程生成管道网格：把管道分段交给进程池，子进程返回 numpy 数组，主进程拼接成一个 TubeNetwork
+# num_process 为1时在本进程中逐段生成
+class TubeMeshBuilder(QObject):
+    """多进程管道网格生成器，每完成一段发出一次进度信号"""
+    progress = pyqtSignal(int, int)  # （已完成的管道数，管道总数）
+
+    def __init__(self, num_process: int):
+        super().__init__()
+        self.num_process = num_process
+
+    # 返回（TubeNetwork，中心线离散点列表），中心线与 ids_tube 一一对应
+    # callback(已完成的管道数, 管道总数) 在每段完成后调用，返回 False 时取消：未开始的段不再生成，返回 None
+    def build(self, ids_tube: list, list_ctrl_points: list, delta: float, tolerance: float,
+              num_sides: int = tube_geometry.NUM_SIDES, callback=None):
+        starts = list(range(0, len(list_ctrl_points), NUM_TUBE_CHUNK))
+        results = [None] * len(starts)
+        num_done = 0
+        if not self.report(num_done, len(list_ctrl_points), callback):
+            return None
+        if (self.num_process <= 1) or (len(starts) <= 1):
+            for j, start in enumerate(starts):
+                results[j] = build_chunk(list_ctrl_points[start:start + NUM_TUBE_CHUNK], delta, tolerance, num_sides)
+                num_done += len(results[j]['centerlines'])
+                if not self.report(num_done, len(list_ctrl_points), callback):
+                    return None
+            return self.assemble(ids_tube, starts, results)
+        # 用 spawn 启动子进程，避免 fork 复制主进程中的 Qt 与 vtk 状态
+        # 取消时不等待正在运行的段：子进程算完当前一段后自行退出
+        executor = ProcessPoolExecutor(max_workers=self.num_process, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            futures = {executor.submit(build_chunk, list_ctrl_points[start:start + NUM_TUBE_CHUNK], delta,
+                                       tolerance, num_sides): j for j, start in enumerate(starts)}
+            for future in as_completed(futures):
+                j = futures[future]
+                results[j] = future.result()
+                num_done += len(results[j]['centerlines'])
+                if not self.report(num_done, len(list_ctrl_points), callback):
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return None
+        except BaseException as error:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+        return self.assemble(ids_tube, starts, results)
+
+    # 发出进度信号，并调用 callback，返回是否继续
+    def report(self, num_done: int, num_total: int, callback=None) -> bool:
+        self.progress.emit(num_done, num_total)
+        return (callback is None) or bool(callback(num_done, num_total))
+
+    # 按管道顺序拼接各段的结果
+    @staticmethod
+    def assemble(ids_tube: list, starts: list, results: list):
+        ids_tube = np.asarray(ids_tube, dtype=np.int32)
+        base_points = np.cumsum([0] + [len(result['points']) for result in results])
+        base_tubes = np.cumsum([0] + [len(result['ids_tube']) for result in results])
+
+        mesh = pv.PolyData()
+        mesh.points = np.concatenate([result['points'] for result in results])
+        for name in NAMES_POINT:
+            if all(name in result['point_data'] for result in results):
+                mesh.point_data[name] = np.concatenate([result['point_data'][name] for result in results])
+        # 各段的管道序号从0开始，加上之前各段的管道数
+        mesh.point_data['tube_id'] = np.concatenate(
+            [result['point_data']['tube_id'] + base for result, base in zip(results, base_tubes)]).astype(np.int32)
+        mesh.SetPolys(concat_cell_arrays([result['polys'] for result in results], base_points))
+        mesh.SetStrips(concat_cell_arrays([result['strips'] for result in results], base_points))
+        # 与单元编号顺序一致：先所有段的多边形，再所有段的三角带
+        mesh.cell_data['tube_id'] = np.concatenate(
+            [result['tube_id_polys'] + base for result, base in zip(results, base_tubes)] +
+            [result['tube_id_strips'] + base for result, base in zip(results, base_tubes)]).astype(np.int32)
+
+        # 各段中的管道编号是段内编号，换算回管道行号
+        ids_tube_ok = np.concatenate([ids_tube[start + result['ids_tube']] for start, result in
+                                      zip(starts, results)])
+        list_points = [points for result in results for points in result['centerlines']]
+        return TubeNetwork(mesh, ids_tube_ok), list_points
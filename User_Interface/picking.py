@@ -0,0 +1,293 @@
+import numpy as np
+import pyvista as pv
+from PyQt5.QtCore import QObject, QPoint, QTimer
+from PyQt5.QtGui import QGuiApplication
+from PyQt5.QtWidgets import QToolTip
+from vtkmodules.vtkCommonCore import vtkIdList
+from vtkmodules.vtkCommonDataModel import vtkStaticPointLocator
+from vtkmodules.vtkRenderingCore import vtkPropPicker
+
+# 管道中心线加密后的点数上限，超出时按比例放大取样间距
+NUM_CENTER_MAX: int = 1 << 22
+
+
+# 拾取用的中心点与静态点定位器：生成几何时建立一次，每次点击只查询离点击处最近的中心点
+class CenterLocator:
+    """中心点定位器：centers[i] 为第 i 个中心点，values 中的各数组与 centers 一一对应"""
+
+    def __init__(self, centers, **values):
+        self.centers = np.ascontiguousarray(centers, dtype=float).reshape(-1, 3)
+        self.values = values
+        # 相邻中心点的最大间距（见 self.from_network()）
+        self.step: float = 0.0
+        # 只需点坐标，不建顶点单元
+        self.dataset = pv.PolyData()
+        self.dataset.points = self.centers
+        self.locator = vtkStaticPointLocator()
+        self.locator.SetDataSet(self.dataset)
+        if len(self.centers):
+            self.locator.BuildLocator()
+
+    def __len__(self):
+        return len(self.centers)
+
+    # 离 position 最近的中心点序号，没有中心点时返回 -1
+    def find(self, position) -> int:
+        if not len(self.centers):
+            return -1
+        return int(self.locator.FindClosestPoint(np.asarray(position, dtype=float)))
+
+    # 三角网格（油箱）：各单元的中心
+    @classmethod
+    def from_cells(cls, mesh: pv.DataSet):
+        return cls(mesh.cell_centers().points)
+
+    # 合并的管道网格：各截面圆环的中心，即扫掠时的中心线取样点，附带其管道行号 'tube_id' 与弧长参数 't'
+    # 管道表面是沿整根管道的三角带，单元中心都在管道中部，无法用于定位；圆环中心与半径无关，修改半径后无需重建
+    # 直管只有首尾2个取样点，因此在同一管道相邻取样点之间按间距 step 插值加密，加密后的间距记为 self.step
+    @classmethod
+    def from_network(cls, network, step: float = 0.0):
+        mesh = network.mesh
+        center = mesh.point_data['center'] if network.is_scalable() else mesh.points
+        # 同一圆环的点连续存放且中心相同，只取每个圆环的第一个点
+        mask = np.ones(len(center), dtype=bool)
+        mask[1:] = np.any(center[1:] != center[:-1], axis=1)
+        ids_point = np.flatnonzero(mask)
+        centers = np.asarray(center[ids_point], dtype=float)
+        tube_id = network.ids_tube[mesh.point_data['tube_id'][ids_point]]
+        t = np.asarray(mesh.point_data['t'], dtype=float)[ids_point]
+
+        # 第 i 个点与下一个点属于同一管道时，该段分为 counts[i] 份，否则 counts[i] 为1
+        mask_segment = np.zeros(len(centers), dtype=bool)
+        mask_segment[:-1] = (tube_id[1:] == tube_id[:-1])
+        lengths = np.zeros(len(centers))
+        lengths[:-1] = np.linalg.norm(centers[1:] - centers[:-1], axis=1)
+        lengths[~mask_segment] = 0
+        step = max(step, lengths.sum() / NUM_CENTER_MAX)
+        counts = np.ones(len(centers), dtype=np.int64)
+        if step > 0:
+            counts[mask_segment] = np.maximum(np.ceil(lengths[mask_segment] / step), 1).astype(np.int64)
+        ids_start = np.repeat(np.arange(len(centers)), counts)
+        bases = np.zeros(len(centers), dtype=np.int64)
+        np.cumsum(counts[:-1], out=bases[1:])
+        fractions = (np.arange(len(ids_start)) - bases[ids_start]) / counts[ids_start]
+        ids_stop = np.minimum(ids_start + 1, len(centers) - 1)
+        locator = cls(centers[ids_start] + fractions[:, None] * (centers[ids_stop] - centers[ids_start]),
+                      tube_id=tube_id[ids_start], t=t[ids_start] + fractions * (t[ids_stop] - t[ids_start]))
+        locator.step = step
+        return locator
+
+
+# 点击拾取：左键按下与松开的位置相同（没有拖动视角）时，用硬件拾取找到点击处的 actor 与世界坐标
+class ClickPicker:
+    """点击拾取器：callback(actor, position)，未点中任何 actor 时不调用"""
+
+    def __init__(self, plotter, callback, tolerance: int = 2):
+        self.plotter = plotter
+        self.callback = callback
+        # 按下与松开的位置相差不超过 tolerance 像素视为点击
+        self.tolerance: int = tolerance
+        self.picker = vtkPropPicker()
+        self.position_press = None
+        self.plotter.iren.add_observer('LeftButtonPressEvent', self.press)
+        self.plotter.iren.add_observer('LeftButtonReleaseEvent', self.release)
+
+    def press(self, obj=None, event=None):
+        self.position_press = self.plotter.iren.interactor.GetEventPosition()
+
+    def release(self, obj=None, event=None):
+        if self.position_press is None:
+            return
+        x, y = self.plotter.iren.interactor.GetEventPosition()
+        x_press, y_press = self.position_press
+        self.position_press = None
+        if max(abs(x - x_press), abs(y - y_press)) <= self.tolerance:
+            self.pick(x, y)
+
+    def pick(self, x: int, y: int):
+        if not self.picker.Pick(x, y, 0, self.plotter.renderer):
+            return
+        actor = self.picker.GetActor()
+        if actor is not None:
+            self.callback(actor, np.array(self.picker.GetPickPosition()))
+
+
+# 标签池：固定数量的标签共用一个点集与同一组标签、标记点 actor，超出数量时覆盖最早的标签，actor 不会越来越多
+class LabelPool:
+    """拾取标签：最多显示 num_label 个，首次添加标签时才建立 actor"""
+
+    def __init__(self, plotter, num_label: int = 8):
+        self.plotter = plotter
+        self.num_label: int = num_label
+        self.positions, self.texts = [], []
+        self.cloud = pv.PolyData()
+        self.actor = None
+
+    def add(self, position, text: str):
+        self.positions.append(np.asarray(position, dtype=float))
+        self.texts.append(text)
+        del self.positions[:-self.num_label], self.texts[:-self.num_label]
+        self.update()
+        if self.actor is None:
+            self.actor = self.plotter.add_point_labels(self.cloud, 'labels', font_size=15, text_color='white',
+                                                       point_color='yellow', point_size=12, always_visible=True,
+                                                       name='labels_pick', pickable=False, reset_camera=False,
+                                                       render=False)
+
+    def clear(self):
+        self.positions, self.texts = [], []
+        self.update()
+
+    # 原地更新点集：各 actor 的输入仍是同一个 self.cloud
+    def update(self):
+        cloud = pv.PolyData(np.array(self.positions).reshape(-1, 3))
+        cloud.point_data['labels'] = np.array(self.texts, dtype=str)
+        self.cloud.copy_from(cloud)
+
+
+# 屏幕定位器：视角或窗口大小改变后，把各组中心点一次投影到屏幕上并建立二维点定位器，查询鼠标附近的点只需几微秒
+class ScreenLocator:
+    """屏幕定位器：第 k 组中心点为 list_centers[k]，其在世界坐标中的拾取半径为 list_radius[k]
+
+    self.find(x, y) 返回屏幕上 (x, y) 落在其拾取半径内、且前表面（深度减去拾取半径）离相机最近的中心点（组号，序号），
+    没有时返回 None；关节与从该关节出发的管道中心重合时，半径较大的关节优先。
+    """
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self.list_centers, self.list_radius = [], []
+        self.state_camera = None
+        # 投影后留在屏幕内的点：屏幕坐标、前表面深度、屏幕上的拾取半径（像素）、组号与组内序号
+        self.points_screen = np.zeros((0, 2))
+        self.dataset = pv.PolyData()
+        self.locator = vtkStaticPointLocator()
+        self.depths, self.radius_pixel, self.groups, self.ids = [np.zeros(0)] * 4
+        self.radius_max: float = 0.0
+        self.ids_found = vtkIdList()
+
+    def set_targets(self, list_centers: list, list_radius: list):
+        self.list_centers = [np.asarray(centers, dtype=float).reshape(-1, 3) for centers in list_centers]
+        self.list_radius = list(list_radius)
+        self.state_camera = None
+
+    # 相机与窗口大小不变时不重新投影
+    def update(self):
+        camera = self.renderer.GetActiveCamera()
+        width, height = self.renderer.GetSize()
+        state_camera = (camera.GetMTime(), width, height)
+        if state_camera == self.state_camera:
+            return
+        self.state_camera = state_camera
+        centers = np.concatenate(self.list_centers + [np.zeros((0, 3))])
+        radius = np.concatenate([np.full(len(c), r, dtype=float) for c, r in zip(self.list_centers, self.list_radius)]
+                                + [np.zeros(0)])
+        groups = np.repeat(np.arange(len(self.list_centers)), [len(c) for c in self.list_centers])
+        ids = np.concatenate([np.arange(len(c)) for c in self.list_centers] + [np.zeros(0, dtype=np.int64)])
+
+        # 世界坐标 → 裁剪坐标，w 为视点坐标系中的深度；投影矩阵的 [1, 1] 元素为竖直方向的缩放
+        aspect = self.renderer.GetTiledAspectRatio()
+        matrix = camera.GetCompositeProjectionTransformMatrix(aspect, -1, 1)
+        matrix = np.array([[matrix.GetElement(i, j) for j in range(4)] for i in range(4)])
+        scale = camera.GetProjectionTransformMatrix(aspect, -1, 1).GetElement(1, 1)
+        clip = centers @ matrix[:, :3].T + matrix[:, 3]
+        w = clip[:, 3] if not camera.GetParallelProjection() else np.ones(len(clip))
+        x_origin, y_origin = self.renderer.GetOrigin()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = (clip[:, 0] / w + 1) * width / 2 + x_origin
+            y = (clip[:, 1] / w + 1) * height / 2 + y_origin
+            # 世界坐标中的半径在该深度处对应的像素数
+            radius_pixel = radius * scale * height / 2 / w
+        # 视点坐标系中的深度（世界单位），减去拾取半径即为前表面的深度
+        view = camera.GetViewTransformMatrix()
+        depth = -(centers @ np.array([view.GetElement(2, j) for j in range(3)]) + view.GetElement(2, 3)) - radius
+        mask = (w > 0) & (x + radius_pixel >= x_origin) & (x - radius_pixel <= x_origin + width) & \
+               (y + radius_pixel >= y_origin) & (y - radius_pixel <= y_origin + height)
+        self.points_screen = np.stack([x[mask], y[mask]], axis=1)
+        self.dataset = pv.PolyData()
+        self.dataset.points = np.stack([x[mask], y[mask], np.zeros(np.count_nonzero(mask))], axis=1)
+        self.depths, self.radius_pixel, self.groups, self.ids = depth[mask], radius_pixel[mask], groups[mask], \
+            ids[mask]
+        self.radius_max = float(self.radius_pixel.max()) if len(self.radius_pixel) else 0.0
+        self.locator = vtkStaticPointLocator()
+        self.locator.SetDataSet(self.dataset)
+        if len(self.depths):
+            self.locator.BuildLocator()
+
+    def find(self, x: float, y: float):
+        self.update()
+        if not len(self.depths):
+            return None
+        self.locator.FindPointsWithinRadius(self.radius_max, (x, y, 0.0), self.ids_found)
+        if not self.ids_found.GetNumberOfIds():
+            return None
+        candidates = np.array([self.ids_found.GetId(i) for i in range(self.ids_found.GetNumberOfIds())])
+        distances = np.hypot(self.points_screen[candidates, 0] - x, self.points_screen[candidates, 1] - y)
+        candidates = candidates[distances <= self.radius_pixel[candidates]]
+        if not len(candidates):
+            return None
+        i = candidates[np.argmin(self.depths[candidates])]
+        return int(self.groups[i]), int(self.ids[i])
+
+
+# 悬停查询：鼠标移动时只记录位置，按显示器刷新率最多查询一次，结果显示在 Qt 提示框中，无需重新渲染
+class HoverInspector(QObject):
+    """悬停查询器：query(组号, 序号) 返回提示文字，组与 self.set_targets() 的各组中心点一一对应
+
+    旋转、缩放视角的过程中不查询。
+    """
+
+    def __init__(self, plotter, query):
+        super().__init__()
+        self.plotter = plotter
+        self.query = query
+        self.locator = ScreenLocator(self.plotter.renderer)
+        self.flag_enabled: bool = True
+        self.flag_interacting: bool = False
+        self.position = None
+        screen = QGuiApplication.primaryScreen()
+        rate = screen.refreshRate() if (screen is not None) and (screen.refreshRate() > 0) else 60
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(max(int(1000 / rate), 1))
+        self.timer.timeout.connect(self.update)
+        self.plotter.iren.add_observer('MouseMoveEvent', self.move)
+        self.plotter.iren.add_observer('StartInteractionEvent', self.start_interaction)
+        self.plotter.iren.add_observer('EndInteractionEvent', self.end_interaction)
+
+    def set_targets(self, list_centers: list, list_radius: list):
+        self.locator.set_targets(list_centers, list_radius)
+
+    def set_enabled(self, flag: bool):
+        self.flag_enabled = flag
+        if not flag:
+            self.timer.stop()
+            QToolTip.hideText()
+
+    def start_interaction(self, obj=None, event=None):
+        self.flag_interacting = True
+        self.timer.stop()
+        QToolTip.hideText()
+
+    def end_interaction(self, obj=None, event=None):
+        self.flag_interacting = False
+
+    def move(self, obj=None, event=None):
+        if (not self.flag_enabled) or self.flag_interacting:
+            return
+        self.position = self.plotter.iren.interactor.GetEventPosition()
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def update(self):
+        if self.position is None:
+            return
+        x, y = self.position
+        found = self.locator.find(x, y)
+        text = self.query(*found) if found is not None else None
+        if text is None:
+            QToolTip.hideText()
+            return
+        # vtk 的显示坐标以左下角为原点、单位为物理像素，换算为 Qt 的窗口坐标
+        ratio = self.plotter.devicePixelRatioF()
+        QToolTip.showText(self.plotter.mapToGlobal(QPoint(int(x / ratio), int(self.plotter.height() - y / ratio))),
+                          text, self.plotter)
@@ -0,0 +1,53 @@
+import time
+from PyQt5.QtCore import QObject, QTimer
+
+
+# 多处触发的渲染请求合并为一次：请求只置脏标记，等回到事件循环（且距上次渲染超过帧预算）时才真正渲染
+class RenderScheduler(QObject):
+    """渲染调度器：同一个事件循环周期内的多次 request() 只渲染一次
+
+    num_request 为请求次数，num_render 为实际渲染次数，num_skipped 为被合并掉的多余渲染次数。
+    """
+
+    def __init__(self, render, time_budget: float = 1 / 60, parent=None):
+        super().__init__(parent)
+        self.render = render
+        # 帧预算（秒）：相邻两次渲染的最小间隔
+        self.time_budget: float = time_budget
+        self.flag_dirty: bool = False
+        self.time_render: float = 0.0
+        self.num_request: int = 0
+        self.num_render: int = 0
+        self.num_skipped: int = 0
+        # 单次定时器，间隔为0时在本次事件处理完后立即触发
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    # 请求渲染：已有未完成的请求时只计数，不重复渲染
+    def request(self):
+        self.num_request += 1
+        if self.flag_dirty:
+            self.num_skipped += 1
+            return
+        self.flag_dirty = True
+        delay = self.time_render + self.time_budget - time.perf_counter()
+        self.timer.start(max(0, int(delay * 1000)))
+
+    # 立即执行尚未完成的渲染
+    def flush(self):
+        self.timer.stop()
+        if not self.flag_dirty:
+            return
+        self.flag_dirty = False
+        self.time_render = time.perf_counter()
+        self.num_render += 1
+        self.render()
+
+    # 丢弃尚未完成的渲染（关闭绘图工具前调用）
+    def cancel(self):
+        self.timer.stop()
+        self.flag_dirty = False
+
+    def report(self) -> str:
+        return '渲染请求 {} 次，实际渲染 {} 次，合并 {} 次'.format(self.num_request, self.num_render, self.num_skipped)
@@ -0,0 +1,47 @@
+import os
+import sys
+import pytest
+import pyvista as pv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fueltank_mesh
+from fueltank_mesh import decimate_mesh
+
+
+# 球面：各方向顶点分布均匀
+@pytest.fixture(scope='module')
+def mesh_sphere():
+    return pv.Sphere(theta_resolution=600, phi_resolution=300).triangulate().clean()
+
+
+# 细长的圆柱：沿轴向只有少数几层顶点，截面方向很密
+@pytest.fixture(scope='module')
+def mesh_cylinder():
+    return pv.Cylinder(resolution=100, height=10, radius=1).triangulate().subdivide(4).clean()
+
+
+@pytest.mark.parametrize('num_face_max', [5000, 20000, 50000])
+def test_clustering_sphere_budget(mesh_sphere, num_face_max):
+    mesh = decimate_mesh(mesh_sphere, num_face_max, 'clustering')
+    assert fueltank_mesh.RATIO_FACE_MIN * num_face_max <= mesh.n_cells <= num_face_max
+
+
+@pytest.mark.parametrize('num_face_max', [5000, 50000, 99000])
+def test_clustering_cylinder_budget(mesh_cylinder, num_face_max):
+    mesh = decimate_mesh(mesh_cylinder, num_face_max, 'clustering')
+    assert fueltank_mesh.RATIO_FACE_MIN * num_face_max <= mesh.n_cells <= num_face_max
+
+
+# 聚类次数不够、结果仍超出时，用边折叠简化到恰好 num_face_max
+def test_clustering_overshoot_decimated(mesh_sphere, monkeypatch):
+    monkeypatch.setattr(fueltank_mesh, 'NUM_CLUSTERING_PASS', 1)
+    mesh = decimate_mesh(mesh_sphere, 50000, 'clustering')
+    assert mesh.n_cells == 50000
+
+
+def test_clustering_cancel(mesh_sphere):
+    assert decimate_mesh(mesh_sphere, 5000, 'clustering', lambda ratio: False) is None
+
+
+def test_decimation_budget(mesh_sphere):
+    assert decimate_mesh(mesh_sphere, 20000, 'decimation').n_cells <= 20000
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+# 时序数据容器：所有时间步存放在一个预先分配的数组中，容量不足时翻倍，追加一个时间步均摊 O(1)
+class TimeSeries:
+    """按（时间步，物理量，关节编号）存放的时序数据
+
+    self.view 为已有的 len(self) 个时间步的视图，不复制数据，可直接用于渲染；self[k, id_attr, :] 等下标与该视图相同。
+    time_ids[k] 为第 k 个时间步的编号（即 input_xx.csv 中的 xx）。
+    """
+
+    def __init__(self, num_attr: int, num_joint: int, capacity: int = 16, dtype=np.float64):
+        self.buffer = np.empty((max(int(capacity), 1), num_attr, num_joint), dtype=dtype)
+        self.buffer_time_ids = np.empty(len(self.buffer), dtype=np.int64)
+        self.size: int = 0
+
+    # 直接包装已有的（时间步，物理量，关节编号）数组，不复制；再追加时才复制到新分配的数组中
+    @classmethod
+    def from_array(cls, data, time_ids):
+        series = cls.__new__(cls)
+        series.buffer = data
+        series.buffer_time_ids = np.asarray(time_ids, dtype=np.int64)
+        series.size = len(data)
+        return series
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, key):
+        return self.view[key]
+
+    @property
+    def view(self) -> np.ndarray:
+        return self.buffer[:self.size]
+
+    @property
+    def time_ids(self) -> np.ndarray:
+        return self.buffer_time_ids[:self.size]
+
+    @property
+    def shape(self) -> tuple:
+        return (self.size,) + self.buffer.shape[1:]
+
+    # 把容量扩大到不少于 capacity 个时间步，已有数据复制一次
+    def reserve(self, capacity: int):
+        if capacity <= len(self.buffer):
+            return
+        buffer = np.empty((capacity,) + self.buffer.shape[1:], dtype=self.buffer.dtype)
+        buffer[:self.size] = self.buffer[:self.size]
+        buffer_time_ids = np.empty(capacity, dtype=np.int64)
+        buffer_time_ids[:self.size] = self.buffer_time_ids[:self.size]
+        self.buffer, self.buffer_time_ids = buffer, buffer_time_ids
+
+    # 追加一个时间步（物理量，关节编号），维度与已有数据不一致时抛出 ValueError
+    def append(self, frame, time_id: int):
+        frame = np.asarray(frame)
+        if not frame.shape == self.buffer.shape[1:]:
+            raise ValueError('时间步的维度 {} 与已有数据 {} 不一致'.format(frame.shape, self.buffer.shape[1:]))
+        if self.size == len(self.buffer):
+            self.reserve(2 * len(self.buffer))
+        self.buffer[self.size] = frame
+        self.buffer_time_ids[self.size] = time_id
+        self.size += 1
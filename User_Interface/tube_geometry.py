@@ -0,0 +1,172 @@
+from functools import lru_cache
+import numpy as np
+import pyvista as pv
+from geomdl import helpers, linalg
+from geomdl.knotvector import generate
+from vtkmodules.util.numpy_support import numpy_to_vtkIdTypeArray
+from vtkmodules.vtkCommonDataModel import vtkCellArray
+
+from network_actors import TubeNetwork
+
+# 圆管截面的默认边数
+NUM_SIDES: int = 20
+
+
+# 曲线阶数：必须满足 degree ≤ (控制点数 − 1)，但是 degree 越大计算量越大
+def get_degree(num_ctrl_points: int) -> int:
+    return min(3, num_ctrl_points - 1)
+
+
+# 同一组（阶数、控制点数、取样数相同）的曲线共用同一套节点向量、取样参数和基函数，只需计算一次
+# 这里直接调用 geomdl 的函数，保证与 geomdl.NURBS.Curve.evalpts 的结果逐位一致
+@lru_cache(maxsize=None)
+def get_basis(degree: int, num_ctrl_points: int, sample_size: int):
+    knot_vector = generate(degree, num_ctrl_points)
+    knots = linalg.linspace(knot_vector[degree], knot_vector[-(degree + 1)], sample_size)
+    spans = helpers.find_spans(degree, knot_vector, num_ctrl_points, knots)
+    basis = helpers.basis_functions(degree, knot_vector, spans, knots)
+    # spans - degree + i 即第 i 个非零基函数对应的控制点编号
+    return np.array(spans, dtype=np.int64) - degree, np.array(basis, dtype=float)
+
+
+# 与 geomdl 相同的取样数：delta = 0.01 约等于 100 个点
+def get_sample_size(delta: float) -> int:
+    return int(np.floor((1.0 / delta) + 0.5))
+
+
+# 批量计算 NURBS 曲线（权重均为1）上的离散点
+# 按（阶数、控制点数、取样数）分组，每组的所有曲线一起计算，返回与输入顺序一致的点数组列表
+# sample_sizes 为各曲线的取样数，不给出时全部按 delta 取样
+def eval_curves(list_ctrl_points: list, delta: float = 0.01, sample_sizes=None) -> list:
+    if sample_sizes is None:
+        sample_sizes = [get_sample_size(delta)] * len(list_ctrl_points)
+    groups = {}
+    for k, ctrl_points in enumerate(list_ctrl_points):
+        groups.setdefault((len(ctrl_points), int(sample_sizes[k])), []).append(k)
+
+    list_points = [None] * len(list_ctrl_points)
+    for (num_ctrl_points, sample_size), ids in groups.items():
+        degree = get_degree(num_ctrl_points)
+        ids_ctrl, basis = get_basis(degree, num_ctrl_points, sample_size)
+        # 齐次坐标（x, y, z, w），权重 w = 1：（曲线数，控制点数，4）
+        ctrl_points_w = np.ones((len(ids), num_ctrl_points, 4))
+        ctrl_points_w[:, :, :3] = [list_ctrl_points[k] for k in ids]
+        # 与 geomdl 相同的累加顺序：依次加上第 i 个非零基函数与对应控制点的乘积
+        curve_points_w = np.zeros((len(ids), len(ids_ctrl), 4))
+        for i in range(degree + 1):
+            curve_points_w += basis[:, i, None] * ctrl_points_w[:, ids_ctrl + i, :]
+        curve_points = curve_points_w[:, :, :3] / curve_points_w[:, :, 3:]
+        for j, k in enumerate(ids):
+            list_points[k] = curve_points[j]
+    return list_points
+
+
+# 根据曲率与弧长为每根曲线选择取样数，使相邻取样点之间的弦高误差不超过 tolerance（mm）
+# list_points 为按同一 delta 密集取样的曲线点，用于估计最大曲率 κ 与最大参数速度 v：
+# 弦长为 s 的圆弧弦高约为 κ·s²/8，均匀参数取样时 s ≤ v / (n − 1)，
+# 因此取样数 n ≥ v·sqrt(κ / (8·tolerance)) + 1；直线管道只需2个点，且不超过密集取样数
+def get_sample_sizes(list_points: list, tolerance: float) -> np.ndarray:
+    points = np.asarray(list_points, dtype=float)
+    sample_size_max = points.shape[1]
+    segments = np.diff(points, axis=1)
+    length = np.linalg.norm(segments, axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 相邻两段的转角除以平均段长，即离散曲率
+        cos_turn = np.einsum('ijk,ijk->ij', segments[:, :-1], segments[:, 1:]) / (length[:, :-1] * length[:, 1:])
+        turn = np.arccos(np.clip(np.nan_to_num(cos_turn, nan=1.0), -1.0, 1.0))
+        curvature = np.nan_to_num(turn / (0.5 * (length[:, :-1] + length[:, 1:])), nan=0.0, posinf=0.0)
+    curvature_max = curvature.max(axis=1) if curvature.shape[1] else np.zeros(len(points))
+    # 密集取样的参数间隔为 1 / (sample_size_max − 1)
+    speed_max = length.max(axis=1) * (sample_size_max - 1)
+    num_segment = np.ceil(speed_max * np.sqrt(curvature_max / (8.0 * tolerance)))
+    return np.clip(num_segment + 1, 2, sample_size_max).astype(np.int64)
+
+
+# 自适应取样：先按 delta 密集取样估计曲率，再按各曲线所需的取样数重新计算
+def eval_curves_adaptive(list_ctrl_points: list, tolerance: float, delta: float = 0.01) -> list:
+    if not list_ctrl_points:
+        return []
+    list_points = eval_curves(list_ctrl_points, delta)
+    return eval_curves(list_ctrl_points, delta, get_sample_sizes(list_points, tolerance))
+
+
+# 计算各管道的中心线：tolerance > 0 时按弦高容差自适应取样，否则按 delta 取样
+def eval_centerlines(list_ctrl_points: list, delta: float, tolerance: float) -> list:
+    if tolerance > 0:
+        return eval_curves_adaptive(list_ctrl_points, tolerance, delta)
+    return eval_curves(list_ctrl_points, delta)
+
+
+# 各中心线上每个点沿弧长的归一化参数 t ∈ [0, 1]（起点为0，终点为1），所有中心线依次连接，float32
+# 扫掠时 vtkTubeFilter 把点数组复制到对应的表面点上，按 t 插值即按沿管道的距离插值
+# 按点数分组，每组的中心线一起累加弧长；每根中心线的结果只与自身有关，与分段并行生成时一致
+def get_arc_parameters(list_points: list) -> np.ndarray:
+    num_points = np.array([len(points) for points in list_points], dtype=np.int64)
+    starts = np.zeros(len(list_points) + 1, dtype=np.int64)
+    np.cumsum(num_points, out=starts[1:])
+    parameters = np.zeros(starts[-1], dtype=np.float32)
+    for num_point in np.unique(num_points[num_points > 1]):
+        ids = np.flatnonzero(num_points == num_point)
+        points = np.array([list_points[k] for k in ids], dtype=float)
+        arc = np.zeros((len(ids), num_point))
+        np.cumsum(np.linalg.norm(np.diff(points, axis=1), axis=2), axis=1, out=arc[:, 1:])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            arc = np.where(arc[:, -1:] > 0, arc / arc[:, -1:], 0)
+        parameters[(starts[ids, None] + np.arange(num_point)).ravel()] = arc.ravel()
+    return parameters
+
+
+# 中心线离散点连成一条折线，点数组 't' 为弧长参数
+def get_polyline(points) -> pv.PolyData:
+    poly = pv.PolyData()
+    poly.points = points
+    poly.lines = np.hstack([np.array([len(points)] + list(range(len(points))), dtype=np.int32)])
+    poly.point_data['t'] = get_arc_parameters([points])
+    return poly
+
+
+# 管道是圆柱形 spline，沿中心线扫掠出半径为 radius 的圆管表面
+def sweep_tube(points, radius: float) -> pv.PolyData:
+    return get_polyline(points).tube(radius=radius)
+
+
+# 所有中心线合并成一个多折线 PolyData，点数组与单元数组 'tube_id' 记录所属的中心线序号，点数组 't' 为弧长参数
+def get_polylines(list_points: list) -> pv.PolyData:
+    num_points = np.array([len(points) for points in list_points], dtype=np.int64)
+    offsets = np.zeros(len(list_points) + 1, dtype=np.int64)
+    np.cumsum(num_points, out=offsets[1:])
+    lines = vtkCellArray()
+    lines.SetData(numpy_to_vtkIdTypeArray(offsets, deep=True),
+                  numpy_to_vtkIdTypeArray(np.arange(offsets[-1], dtype=np.int64), deep=True))
+    poly = pv.PolyData()
+    poly.points = np.concatenate(list_points) if list_points else np.zeros((0, 3))
+    poly.SetLines(lines)
+    poly.point_data['tube_id'] = np.repeat(np.arange(len(list_points), dtype=np.int32), num_points)
+    poly.point_data['t'] = get_arc_parameters(list_points)
+    poly.cell_data['tube_id'] = np.arange(len(list_points), dtype=np.int32)
+    return poly
+
+
+# 一次扫掠所有中心线，得到半径为 1 的圆管表面，结果与逐根 sweep_tube 后拼接逐位一致
+# vtk 的圆管表面点 = 中心线点 + 半径 × 偏移方向，对半径是线性的，
+# 因此记录每个表面点对应的中心线点 'center' 与单位偏移 'direction'，之后修改半径无需重新扫掠
+# 同一管道的点与单元连续排列，'tube_id' 随输入的中心线序号递增；无法生成的中心线（如退化为一点）被跳过
+def sweep_tubes_unit(list_points: list, num_sides: int = NUM_SIDES) -> pv.PolyData:
+    poly = get_polylines(list_points)
+    grid_center = poly.tube(radius=0, n_sides=num_sides)
+    grid_tube = poly.tube(radius=1, n_sides=num_sides)
+    grid_tube.point_data['center'] = grid_center.points
+    grid_tube.point_data['direction'] = grid_tube.points - grid_center.points
+    return grid_tube
+
+
+# 扫掠半径为1的所有管道表面，合并成一个 TubeNetwork；被跳过的管道不计入，'tube_id' 重新编号为连续的序号
+def build_network(ids_tube: list, list_points: list, num_sides: int = NUM_SIDES) -> TubeNetwork:
+    mesh = sweep_tubes_unit(list_points, num_sides)
+    if mesh.n_points == 0:
+        mesh.point_data['tube_id'] = np.zeros(0, dtype=np.int32)
+        mesh.cell_data['tube_id'] = np.zeros(0, dtype=np.int32)
+    ids_ok = np.unique(mesh.point_data['tube_id'])
+    mesh.point_data['tube_id'] = np.searchsorted(ids_ok, mesh.point_data['tube_id']).astype(np.int32)
+    mesh.cell_data['tube_id'] = np.searchsorted(ids_ok, mesh.cell_data['tube_id']).astype(np.int32)
+    return TubeNetwork(mesh, np.asarray(ids_tube, dtype=np.int32)[ids_ok])
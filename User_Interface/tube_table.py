@@ -0,0 +1,129 @@
+import io
+import csv
+import numpy as np
+import pandas as pd
+
+
+# 多个连续区间 [starts[i], starts[i] + lengths[i]) 依次连接成的下标数组
+def get_ranges(starts, lengths) -> np.ndarray:
+    lengths = np.asarray(lengths, dtype=np.int64)
+    bases = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=bases[1:])
+    return np.repeat(np.asarray(starts, dtype=np.int64) - bases, lengths) + np.arange(lengths.sum(), dtype=np.int64)
+
+
+# tube_info.csv 每行的列依次为：管道编号、管道连接的2个关节编号、中间n个NURBS形状控制点的3维坐标，列数不定
+class TubeTable:
+    """管道连接表：所有行存放在几个扁平的 numpy 数组中
+
+    第 k 根管道的编号为 ids[k]，连接的2个关节为 joints[k]，
+    中间控制点为 points[offsets[k]:offsets[k + 1]]。
+    rows_skipped 为列数不是3的倍数而被跳过的行号（文件中的行号，标题行为第1行）。
+    """
+
+    def __init__(self, ids, joints, points, offsets, rows_skipped=()):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.joints = np.asarray(joints, dtype=np.int64).reshape(-1, 2)
+        self.points = np.asarray(points, dtype=float).reshape(-1, 3)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.rows_skipped = list(rows_skipped)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # 一次读入整个文件：先按字节统计每行的列数，再把所有数值当作一列交给 pandas 的 C 解析器
+    # 文件中有引号、空格等无法按列数直接对齐的内容时，退回逐行读取
+    @classmethod
+    def read(cls, path_file: str):
+        with open(path_file, 'rb') as f:
+            data = f.read()
+        try:
+            return cls.parse(data)
+        except Exception as error:
+            return cls.read_rows(path_file)
+
+    @classmethod
+    def parse(cls, data: bytes):
+        # 去掉 BOM、\r 与标题行（首行）
+        data = data.removeprefix(b'\xef\xbb\xbf').replace(b'\r', b'')
+        body = data[data.index(b'\n') + 1:].rstrip(b'\n') if b'\n' in data else b''
+        if not body:
+            return cls.from_counts(np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+        # 每行的列数 = 该行的逗号数 + 1；空行不计入
+        array = np.frombuffer(body, dtype=np.uint8)
+        ends_line = np.append(np.flatnonzero(array == ord('\n')), len(array))
+        starts_line = np.concatenate([[0], ends_line[:-1] + 1])
+        counts = np.diff(np.concatenate([[0], np.searchsorted(np.flatnonzero(array == ord(',')), ends_line)])) + 1
+        mask_blank = (ends_line == starts_line)
+
+        # 换行也当作逗号，所有数值连成一列
+        column = body.replace(b'\n', b',')
+        values = pd.read_csv(io.BytesIO(column), header=None, dtype=np.float64, engine='c', lineterminator=',',
+                             skip_blank_lines=False).to_numpy()[:, 0]
+        if not len(values) == counts.sum():
+            raise ValueError('列数与数值个数不一致')
+        # 空行只有一个空值，去掉
+        values = values[np.repeat(~mask_blank, counts)]
+        rows = np.flatnonzero(~mask_blank) + 2
+        return cls.from_counts(values, counts[~mask_blank], rows)
+
+    # values 为所有行依次连接的数值，counts 为每行的列数（均不为0），rows 为每行在文件中的行号
+    @classmethod
+    def from_counts(cls, values, counts, rows):
+        starts = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+        # 列数必须是3的倍数，且至少有管道编号与2个关节编号；缺值的行同样跳过
+        mask_ok = (counts >= 3) & (counts % 3 == 0)
+        if len(counts):
+            mask_ok &= np.logical_and.reduceat(~np.isnan(values), starts[:-1])
+
+        starts_ok = starts[:-1][mask_ok]
+        counts_ok = counts[mask_ok]
+        ids = values[starts_ok]
+        joints = values[np.stack([starts_ok + 1, starts_ok + 2], axis=1)]
+        # 各行第4列起的数值为中间控制点
+        num_ctrl = (counts_ok - 3) // 3
+        offsets = np.zeros(len(counts_ok) + 1, dtype=np.int64)
+        np.cumsum(num_ctrl, out=offsets[1:])
+        return cls(ids, joints, values[get_ranges(starts_ok + 3, 3 * num_ctrl)], offsets, np.asarray(rows)[~mask_ok])
+
+    # 逐行读取，与 csv.reader 的行为一致，较慢
+    @classmethod
+    def read_rows(cls, path_file: str):
+        values, counts, rows = [], [], []
+        with open(path_file, newline='', encoding='utf-8-sig') as f:
+            f_reader = csv.reader(f)
+            next(f_reader)  # 跳过首行标题行
+            for f_row in f_reader:
+                if not f_row:
+                    continue
+                try:
+                    row_values = list(map(float, f_row))
+                except ValueError as error:
+                    row_values = [np.nan] * len(f_row)
+                values.extend(row_values)
+                counts.append(len(row_values))
+                rows.append(f_reader.line_num)
+        return cls.from_counts(np.array(values, dtype=float), np.array(counts, dtype=np.int64),
+                               np.array(rows, dtype=np.int64))
+
+    # 每根管道的全部控制点：起点关节、中间控制点、终点关节
+    # 返回（管道行号列表，控制点数组列表），关节编号超出范围的管道被跳过
+    def get_ctrl_points(self, coord_joint):
+        coord_joint = np.asarray(coord_joint, dtype=float)
+        mask_ok = np.all((self.joints >= 0) & (self.joints < len(coord_joint)), axis=1)
+        ids_tube = np.flatnonzero(mask_ok)
+        # 每根管道多出首尾2个点，先整体排好，再按偏移切分
+        num_ctrl = np.diff(self.offsets)[ids_tube] + 2
+        offsets = np.zeros(len(ids_tube) + 1, dtype=np.int64)
+        np.cumsum(num_ctrl, out=offsets[1:])
+        ctrl_points = np.empty((offsets[-1], 3))
+        ctrl_points[offsets[:-1]] = coord_joint[self.joints[ids_tube, 0]]
+        ctrl_points[offsets[1:] - 1] = coord_joint[self.joints[ids_tube, 1]]
+        mask_middle = np.ones(offsets[-1], dtype=bool)
+        mask_middle[offsets[:-1]] = False
+        mask_middle[offsets[1:] - 1] = False
+        ctrl_points[mask_middle] = self.points[get_ranges(self.offsets[ids_tube], num_ctrl - 2)]
+        return ids_tube.tolist(), [ctrl_points[start:stop] for start, stop in zip(offsets[:-1].tolist(),
+                                                                                   offsets[1:].tolist())]
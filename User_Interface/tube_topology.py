@@ -0,0 +1,42 @@
+import numpy as np
+
+
+# 管路的图结构：关节为顶点，管道为边，读取管路文件后编译一次
+class TubeTopology:
+    """管路拓扑：按 CSR 方式记录每个关节连接的管道
+
+    endpoints[k] 为第 k 根管道（tube_info.csv 中的行号）连接的2个关节编号，关节编号超出范围的管道记为 -1，不计入邻接表。
+    关节 j 连接的管道为 tubes[offsets[j]:offsets[j + 1]]，其个数为 degrees[j]（两端连在同一关节的管道计2次）。
+    """
+
+    def __init__(self, joints, num_joint: int):
+        self.num_joint: int = int(num_joint)
+        self.endpoints = np.asarray(joints, dtype=np.int32).reshape(-1, 2).copy()
+        self.num_tube: int = len(self.endpoints)
+        self.mask_valid = np.all((self.endpoints >= 0) & (self.endpoints < self.num_joint), axis=1)
+        self.endpoints[~self.mask_valid] = -1
+
+        ids_valid = np.flatnonzero(self.mask_valid).astype(np.int32)
+        joints_valid = self.endpoints[ids_valid].ravel()
+        # 按关节编号稳定排序，同一关节的管道按管道行号递增
+        order = np.argsort(joints_valid, kind='stable')
+        self.tubes = np.repeat(ids_valid, 2)[order]
+        self.degrees = np.bincount(joints_valid, minlength=self.num_joint).astype(np.int32)
+        self.offsets = np.zeros(self.num_joint + 1, dtype=np.int64)
+        np.cumsum(self.degrees, out=self.offsets[1:])
+
+    # 关节 id_joint 连接的管道行号
+    def get_tubes(self, id_joint: int) -> np.ndarray:
+        return self.tubes[self.offsets[id_joint]:self.offsets[id_joint + 1]]
+
+    # 关节 id_joint 经各管道相连的另一端关节，与 self.get_tubes() 一一对应
+    def get_neighbors(self, id_joint: int) -> np.ndarray:
+        endpoints = self.endpoints[self.get_tubes(id_joint)]
+        return np.where(endpoints[:, 0] == id_joint, endpoints[:, 1], endpoints[:, 0])
+
+    # 各管道两端关节的值（管道数，2），关节编号无效的管道为 0
+    def gather(self, data_joint, ids_tube=None) -> np.ndarray:
+        endpoints = self.endpoints if ids_tube is None else self.endpoints[ids_tube]
+        values = np.asarray(data_joint)[np.maximum(endpoints, 0)]
+        values[endpoints < 0] = 0
+        return values
@@ -1,11 +1,8 @@
 import os
-import csv
 import numpy as np
 import pandas as pd
-from geomdl import NURBS
-from geomdl.knotvector import generate
 from PyQt5 import QtWidgets
-from PyQt5.QtWidgets import QDialog, QMessageBox, QTextEdit
+from PyQt5.QtWidgets import QDialog, QMessageBox, QProgressDialog, QTextEdit
 from PyQt5.QtCore import Qt, QObject, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QDoubleValidator
 import pyvista as pv
@@ -15,6 +12,19 @@ from watchdog.events import FileSystemEventHandler
 
 # import ui_first
 import ui_flow
+from network_actors import JointGlyphs
+import tube_geometry
+from parallel_geometry import NUM_TUBE_CHUNK, TubeMeshBuilder
+from render_scheduler import RenderScheduler
+from picking import CenterLocator, ClickPicker, HoverInspector, LabelPool
+from geometry_cache import GeometryCache, hash_files
+from fueltank_mesh import FueltankCache, FueltankLoader
+from tube_table import TubeTable
+from tube_topology import TubeTopology
+from time_series import TimeSeries
+from data_loader import DataLoader, LazySeries, get_time_id, list_data_files
+from data_pack import PACK_SUFFIX, open_pack
+from jobs import FunctionJob, JobRunner
 
 os.environ['PYVISTA_USE_OFF_SCREEN'] = 'True'
 
@@ -51,15 +61,29 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         self.plotter = QtInteractor(self.frame_graph)
         self.plotter.set_background(color='#E3EFFC')
         self.plotter.show_axes()
+        # 所有需要重新渲染的地方只提交请求，同一个事件循环周期内合并为一次渲染
+        self.scheduler_render = RenderScheduler(self.plotter.render, parent=self)
+        # 后台任务：油箱（'fueltank'）、管路（'tube'）、数据文件（'data'）的读取在 QThread 里运行，窗口保持响应
+        # 进度显示在 self.textBrowser_215（油箱为进度对话框），再次点击“读取”可取消，详见 jobs.JobRunner
+        self.jobs = JobRunner(self)
 
         # ********************功能区：模型：油箱与管路********************
         # 油箱
         self.grid_fueltank = None
         self.actor_fueltank = None
+        self.locator_fueltank = None
         # stl文件默认单位mm
         self.comboBox_111.setCurrentIndex(1)
         # 是否隐藏油箱，默认显示
         self.radioButton_113.setChecked(True)
+        # 显示用的油箱三角形数上限，超出则简化，设为 0 则不简化
+        # 简化方法：'clustering' 顶点聚类（快），'decimation' 二次误差边折叠（慢，质量更好），详见 fueltank_mesh
+        self.num_face_fueltank: int = 500000
+        self.method_fueltank_decimate: str = 'clustering'
+        # 油箱网格缓存：换算单位、简化后的网格存为二进制 .tank 文件，再次读取同一 stl 时内存映射读取
+        self.fueltank_cache = FueltankCache(os.path.join(os.path.expanduser('~'), '.fueltank_twin', 'fueltank'))
+        # 读取油箱模型的过程中显示进度对话框，可取消
+        self.dialog_fueltank = None
 
         # 关节与管道
         # 关节坐标与管道连接方式
@@ -67,10 +91,45 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         self.file_tube: str = 'tube_info.csv'
         self.lineEdit_1231.setText(self.file_joint)
         self.lineEdit_1241.setText(self.file_tube)
+        # self.line_tube 为 tube_table.TubeTable，各管道的关节编号与控制点存放在扁平的数组中
         self.coord_joint, self.line_tube = None, None
-        # 关节与管道的网格
-        self.grids_joint, self.grids_tube = [], []
-        self.actors_joint, self.actors_tube = [], []
+        # 管路拓扑：各管道两端的关节、各关节连接的管道，读取管路文件后编译一次，详见 tube_topology.TubeTopology
+        self.topology_tube = None
+        # 关节的网格：所有关节共用一个点云和一个 actor，详见 network_actors.JointGlyphs
+        self.glyph_joint = None
+        self.locator_joint = None
+        # 管道的网格
+        self.grids_tube = []
+        # self.grids_tube 中各网格对应的管道行号（关节编号有误或扫掠失败的管道被跳过，不一定连续）
+        self.ids_grids_tube = []
+        self.actors_tube = []
+        # 管道中心线的缓存：（管道行号列表，中心线离散点列表），修改管道半径时无需重新计算 NURBS 曲线
+        self.centerlines_tube = None
+        # 合并模式：所有管道合并为一个网格、一个 actor，详见 network_actors.TubeNetwork
+        # 关闭时每根管道各有一个网格和一个 actor
+        self.flag_tube_merged: bool = True
+        self.network_tube = None
+        # 拾取、悬停查询管道用的定位器（合并模式），按第0层网格建立，各层共用，详见 picking.CenterLocator.from_network
+        self.locator_tube = None
+        # 细节层次（合并模式）：每层一个 TubeNetwork，self.network_tube 是当前显示的一层
+        # 第 k 层的（弦高容差倍数，截面边数），层数越大中心线取样越少、截面边数越少
+        self.tube_lod: list[tuple[float, int]] = [(1, tube_geometry.NUM_SIDES), (8, 8), (64, 4)]
+        self.networks_lod = []
+        # 管道半径在屏幕上不小于 self.lod_pixels[k] 像素时显示第 k 层，否则显示最后一层
+        # 旋转、缩放视角的过程中再降一层，松开鼠标后恢复；关节随管道切换到相同的层
+        self.flag_lod: bool = True
+        self.lod_pixels: list[float] = [4.0, 1.0]
+        self.level_lod: int = 0
+        self.flag_interacting: bool = False
+        # 合并模式下管道数不少于 self.num_tube_parallel 时，用 self.num_process 个进程并行生成网格
+        self.num_tube_parallel: int = 5000
+        self.num_process: int = os.cpu_count() or 1
+        # 数据文件不少于 self.num_file_parallel 个时，用 self.num_process 个进程并行读取
+        self.num_file_parallel: int = 1000
+        # 延迟读取：打开数据文件夹时只读取第一个时间步，其余时间步在首次显示时才读取，最多保留 self.data_budget 字节
+        # self.flag_data_lazy 为 True，或全部读入内存所需的空间超过 self.data_budget 时使用，详见 data_loader.LazySeries
+        self.flag_data_lazy: bool = False
+        self.data_budget: int = 1 << 30
         # 关节是方形的 cube，边长 self.joint_diameter 可调整，默认值 50mm
         self.joint_diameter: float = 50
         self.lineEdit_1232.setValidator(QDoubleValidator())
@@ -79,6 +138,15 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         self.tube_radius: float = 20
         self.lineEdit_1242.setValidator(QDoubleValidator())
         self.lineEdit_1242.setText(str(self.tube_radius))
+        # 管道中心线 NURBS 曲线的取样密度，0.01约等于100段
+        self.tube_delta: float = 0.01
+        # 自适应取样的弦高容差（mm）：按曲率与弧长为每根管道选择取样数，直管只取2个点
+        # 取样数不超过 self.tube_delta 对应的取样数；设为 0 则所有管道都按 self.tube_delta 取样
+        self.tube_tolerance: float = 1.0
+        # 管路几何缓存：输入文件与网格参数都不变时，直接读取上次生成的管道网格（仅合并模式）
+        self.geometry_cache = GeometryCache(os.path.join(os.path.expanduser('~'), '.fueltank_twin', 'geometry'))
+        # 关节坐标文件与管道连接文件内容的哈希值，读取管路文件时计算
+        self.hash_tube_input = None
 
         # ********************功能区：数据********************
         # 用于正确识别并按顺序读取时序文件，详见 self.readDirectoryData()
@@ -86,10 +154,14 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         self.data_file_time_id = []
         # 总时间步
         self.time_total = len(self.data_file_time_id)
-        # 储存各关节数据：三维数组：（时间步，物理量，关节编号）
+        # 储存各关节数据：（时间步，物理量，关节编号），追加时间步无需复制已有数据，详见 time_series.TimeSeries
         self.data = None
+        # 当前显示的各关节数据，切换细节层次后用于重新写入管道标量
+        self.data_now = None
         # 当前显示的时间步
         self.time_present_id: int = 0
+        # 读取数据文件夹的过程中新出现的数据文件，读取完毕后再依次追加
+        self.files_data_pending = []
         # 自动读取
         self.radioButton_213.setChecked(False)
 
@@ -112,6 +184,18 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         self.scalar_bar_unit: list[str] = ['mm/s', 'Pa', 'K']
         self.scalar_bar_range: list[list[float]] = [[15, 90], [100, 800], [283, 363]]
         self.show_bar_range()
+        # 关节与管道共用的颜色映射表，只在切换属性或修改数值范围时更新，逐帧只写入标量
+        self.lut_data = pv.LookupTable(cmap='jet')
+        self.range_lut = None
+        self.set_lut_range()
+        # 每个属性一个预先建好的数值条，共用上面的颜色映射表，切换属性时只切换可见性
+        self.scalar_bars = [self.plotter.add_scalar_bar(title=title, lookup_table=self.lut_data, color='firebrick',
+                                                        title_font_size=15, label_font_size=10, width=0.5,
+                                                        vertical=False, position_x=0.3, position_y=0.1,
+                                                        render=False) for title in self.scalar_bar_title]
+        for scalar_bar in self.scalar_bars:
+            scalar_bar.VisibilityOff()
+        self.id_scalar_bar: int = -1  # 当前显示的数值条，-1 为不显示
 
         # ********************定时器********************
         self.timer = QTimer(self)
@@ -119,7 +203,15 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         self.timer.timeout.connect(self.show_run_next)
         self.flag_autorun: bool = False
 
-        self.plotter.enable_cell_picking(callback=self.onPick, left_clicking=True, show_message=False, show_point=True)
+        # 点击拾取：标注关节、管道或油箱，标签数量固定，详见 picking.py
+        self.picker = ClickPicker(self.plotter, self.onPick)
+        self.labels_pick = LabelPool(self.plotter, 8)
+        # 悬停查询：鼠标所指的关节或管道，按显示器刷新率更新提示框
+        self.hover = HoverInspector(self.plotter, self.query_hover)
+        # 每次渲染前按管道在屏幕上的大小与交互状态选择细节层次
+        self.plotter.renderer.AddObserver('StartEvent', self.update_lod)
+        self.plotter.iren.add_observer('StartInteractionEvent', self.start_interaction)
+        self.plotter.iren.add_observer('EndInteractionEvent', self.end_interaction)
 
         # ********************功能区：模型********************
         self.pushButton_111.clicked.connect(self.get_file_fueltank)
@@ -178,7 +270,7 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
     # ************************************************************
     # “选择文件”按钮：选择油箱模型文件路径
     def get_file_fueltank(self):
-        path_file, file_type = QtWidgets.QFileDialog.getOpenFileName(self, caption='请选择文件', filter='stl (*.stl)')
+        path_file, file_type = QtWidgets.QFileDialog.getOpenFileName(self, caption='请选择文件', filter='stl (*.stl);;tank (*.tank)')
         self.lineEdit_112.setText(path_file)
 
     # “读取”按钮：读取油箱模型文件
@@ -188,28 +280,71 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
             if QMessageBox.No == QMessageBox.question(self, '温馨提示', '已读取过油箱模型，是否覆盖？',
                                                       QMessageBox.Yes | QMessageBox.No, QMessageBox.No):
                 return
+        # 正在读取时不重复读取
+        if self.jobs.is_running('fueltank'):
+            return
         path_file_fueltank = self.lineEdit_112.text().strip()
-        # 路径必须存在且必须是stl文件
-        if os.path.exists(path_file_fueltank) and path_file_fueltank.lower().endswith('.stl'):
-            # stl文件必须能被正常读取
-            try:
-                self.grid_fueltank = pv.read(path_file_fueltank)
-                # 单位m，读进来改成mm
-                if int(self.comboBox_111.currentIndex()) == 0:
-                    self.grid_fueltank.points *= 1000
-            except Exception as error:
-                QtWidgets.QMessageBox.critical(None, '温馨提示', '文件读取失败，请检查文件是否损坏！')
-                return
-            # 读取完毕，显示油箱
-            self.show_fueltank_init()
+        # 路径必须存在且必须是stl文件，或已转换好的 .tank 文件（详见 fueltank_mesh.convert_stl）
+        if os.path.exists(path_file_fueltank) and path_file_fueltank.lower().endswith(('.stl', '.tank')):
+            # 单位m，读进来改成mm
+            scale = 1000 if int(self.comboBox_111.currentIndex()) == 0 else 1
+            loader = FueltankLoader(path_file_fueltank, scale, self.num_face_fueltank, self.method_fueltank_decimate,
+                                    self.fueltank_cache)
+            loader.progress.connect(self.show_fueltank_progress)
+            loader.loaded.connect(self.set_grid_fueltank)
+            loader.failed.connect(self.show_fueltank_fail)
+            self.dialog_fueltank = QProgressDialog('油箱模型读取中...', '取消', 0, 100, self)
+            self.dialog_fueltank.setWindowModality(Qt.WindowModal)
+            self.dialog_fueltank.setAutoClose(False)
+            self.dialog_fueltank.setAutoReset(False)
+            self.dialog_fueltank.canceled.connect(self.cancel_fueltank)
+            self.dialog_fueltank.show()
+            self.jobs.start('fueltank', loader)
         else:
             QtWidgets.QMessageBox.critical(None, '温馨提示', '文件不存在或类型不正确，请检查路径是否正确！')
 
+    def show_fueltank_progress(self, percent: int, num_total: int, stage: str):
+        if self.dialog_fueltank is not None:
+            self.dialog_fueltank.setLabelText('油箱模型读取中：' + stage)
+            self.dialog_fueltank.setValue(percent)
+
+    # 读取完毕，显示油箱；取消时 grid_fueltank 为 None，保留原有的油箱
+    def set_grid_fueltank(self, grid_fueltank):
+        if not self.jobs.finish('fueltank', self.sender()):
+            return
+        self.clear_loader_fueltank()
+        if grid_fueltank is None:
+            return
+        self.grid_fueltank = grid_fueltank
+        self.locator_fueltank = CenterLocator.from_cells(self.grid_fueltank)
+        self.show_fueltank_init()
+
+    def show_fueltank_fail(self, text_error: str):
+        if not self.jobs.finish('fueltank', self.sender()):
+            return
+        self.clear_loader_fueltank()
+        QtWidgets.QMessageBox.critical(None, '温馨提示', '文件读取失败，请检查文件是否损坏！')
+
+    # 不经过信号，直接通知读取线程停止
+    def cancel_fueltank(self):
+        self.jobs.cancel('fueltank')
+
+    def clear_loader_fueltank(self):
+        if self.dialog_fueltank is not None:
+            self.dialog_fueltank.close()
+        self.dialog_fueltank = None
+
     # “选择文件夹”按钮：选择管路文件夹路径
     def get_directory_tube(self):
         self.lineEdit_122.setText(QtWidgets.QFileDialog.getExistingDirectory(self, caption='请选择文件夹'))
 
     def read_directory_tube(self):
+        # 正在读取时，再次点击可取消读取
+        if self.jobs.is_running('tube'):
+            if QMessageBox.Yes == QMessageBox.question(self, '温馨提示', '正在读取管路文件，是否取消读取？',
+                                                       QMessageBox.Yes | QMessageBox.No, QMessageBox.No):
+                self.jobs.cancel('tube')
+            return
         # 如果已经读取过管路文件，询问是否覆盖
         if (self.coord_joint is not None) and (self.line_tube is not None):
             if QMessageBox.No == QMessageBox.question(self, '温馨提示', '已读取过管路文件，是否覆盖？',
@@ -218,50 +353,85 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         path_folder = self.lineEdit_122.text().strip()
         # 检查文件夹是否存在
         if os.path.exists(path_folder):
-            # 读取关节坐标
             path_joint = os.path.join(path_folder, self.file_joint)
-            if os.path.exists(path_joint):
-                try:
-                    self.coord_joint = pd.read_csv(path_joint, header=0, encoding='utf-8').fillna(0).to_numpy()[:, 1:4]
-                    self.set_grids_joint()
-                except Exception as error:
-                    QtWidgets.QMessageBox.critical(None, '温馨提示', '{} 读取失败，请检查文件格式是否正确！'.format(
-                        self.file_joint))
-                    return
-            else:
-                QtWidgets.QMessageBox.critical(None, '温馨提示', '文件夹内不存在 {}，请检查文件名是否正确！'.format(
-                    self.file_joint))
-                return
-            # 读取管道连接方式
             path_tube = os.path.join(path_folder, self.file_tube)
-            if os.path.exists(path_tube):
-                try:
-                    # 需要支持列数不定的csv，不能用pandas
-                    line_tube = []
-                    with open(path_tube, newline='', encoding='utf-8') as f:
-                        f_reader = csv.reader(f)
-                        next(f_reader)  # 跳过首行标题行
-                        for f_row in f_reader:  # 逐行读取
-                            # 列数必然是3的倍数（列依次为：管道编号、管道连接的2个关节编号、中间n个NURBS形状控制点的3维坐标）
-                            if len(f_row) % 3 == 0:
-                                line_tube.append(list(map(float, f_row)))  # 把每行的字符串转 float
-                    if line_tube:
-                        self.line_tube = line_tube
-                        self.set_grids_tube_spline()
-                except Exception as error:
-                    QtWidgets.QMessageBox.critical(None, '温馨提示', '{} 读取失败，请检查文件格式是否正确！'.format(
-                        self.file_tube))
+            for path_file, name_file in ((path_joint, self.file_joint), (path_tube, self.file_tube)):
+                if not os.path.exists(path_file):
+                    QtWidgets.QMessageBox.critical(None, '温馨提示', '文件夹内不存在 {}，请检查文件名是否正确！'.format(
+                        name_file))
                     return
-            else:
-                QtWidgets.QMessageBox.critical(None, '温馨提示', '文件夹内不存在 {}，请检查文件名是否正确！'.format(
-                    self.file_tube))
-                return
-            # 读取完毕，显示管路
-            self.show_tube_init()
-            self.show_tube_data_time()
+            # 在后台读取并生成网格：关节读取完毕先显示关节，管道网格生成完毕再显示管道，详见 self.load_tube()
+            job = FunctionJob(self.load_tube, path_joint, path_tube)
+            job.progress.connect(self.show_job_progress)
+            job.partial.connect(self.set_tube_joints)
+            job.loaded.connect(self.set_tube_loaded)
+            job.failed.connect(self.show_tube_fail)
+            self.jobs.start('tube', job)
         else:
             QtWidgets.QMessageBox.critical(None, '温馨提示', '文件夹不存在，请检查路径是否正确！')
 
+    # 后台任务 'tube'（在读取线程中运行，不访问界面控件）：读取关节坐标与管道连接方式，并生成管道网格
+    # 关节坐标读取后先作为部分结果发出；返回管道的读取结果，取消时返回 None；文件读取失败时抛出异常，说明哪个文件
+    def load_tube(self, job, path_joint: str, path_tube: str):
+        job.report(0, 0, '关节读取中')
+        try:
+            coord_joint = pd.read_csv(path_joint, header=0, encoding='utf-8').fillna(0).to_numpy()[:, 1:4]
+        except Exception as error:
+            raise ValueError('{} 读取失败，请检查文件格式是否正确！'.format(self.file_joint))
+        job.partial.emit(coord_joint)
+        if not job.report(0, 0, '管道读取中'):
+            return None
+        try:
+            # 列数不定的csv，一次读入，详见 tube_table.TubeTable
+            # 列数必然是3的倍数（列依次为：管道编号、管道连接的2个关节编号、中间n个NURBS形状控制点的3维坐标）
+            # 不是3的倍数的行被跳过，并显示其行号
+            line_tube = TubeTable.read(path_tube)
+            result = {'line_tube': line_tube, 'topology_tube': None, 'hash_tube_input': None, 'tubes': None}
+            if len(line_tube):
+                result['topology_tube'] = TubeTopology(line_tube.joints, len(coord_joint))
+                result['hash_tube_input'] = hash_files([path_joint, path_tube])
+                result['tubes'] = self.build_tubes(line_tube, coord_joint, result['hash_tube_input'], job)
+                if result['tubes'] is None:
+                    return None
+        except Exception as error:
+            raise ValueError('{} 读取失败，请检查文件格式是否正确！'.format(self.file_tube))
+        return result
+
+    # 关节读取完毕：先显示关节，移除原有的管道；管道读取完毕前 self.line_tube 为 None，不能读取数据文件
+    def set_tube_joints(self, coord_joint):
+        if not self.jobs.is_current('tube', self.sender()):
+            return
+        self.coord_joint = coord_joint
+        self.line_tube, self.topology_tube = None, None
+        self.clear_tubes()
+        self.set_grids_joint()
+        self.show_tube_init()
+        self.show_tube_data_time()
+
+    # 管道读取完毕，显示管路；取消时只保留已显示的关节
+    def set_tube_loaded(self, result):
+        if not self.jobs.finish('tube', self.sender()):
+            return
+        if result is None:
+            self.textBrowser_215.setText('管路读取已取消')
+            return
+        self.textBrowser_215.setText('')
+        self.show_tube_skipped(result['line_tube'].rows_skipped)
+        if len(result['line_tube']):
+            self.line_tube = result['line_tube']
+            self.topology_tube = result['topology_tube']
+            self.hash_tube_input = result['hash_tube_input']
+            self.set_tubes(result['tubes'])
+        # 读取完毕，显示管路
+        self.show_tube_init()
+        self.show_tube_data_time()
+
+    def show_tube_fail(self, text_error: str):
+        if not self.jobs.finish('tube', self.sender()):
+            return
+        self.textBrowser_215.setText('')
+        QtWidgets.QMessageBox.critical(None, '温馨提示', text_error)
+
     def set_file_joint(self):
         self.file_joint = self.lineEdit_1231.text().strip()
 
@@ -275,9 +445,10 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
             self.lineEdit_1232.setText(str(self.joint_diameter))
         else:
             self.joint_diameter = joint_diameter
-        self.set_grids_joint()
-        self.show_tube_init()
-        self.show_tube_data_time()
+        if self.glyph_joint is not None:
+            self.glyph_joint.set_diameter(self.joint_diameter)
+            self.set_hover_targets()
+            self.scheduler_render.request()
 
     def set_tube_radius(self):
         tube_radius = float(self.lineEdit_1242.text().strip())
@@ -286,59 +457,238 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
             self.lineEdit_1242.setText(str(self.tube_radius))
         else:
             self.tube_radius = tube_radius
-        self.set_grids_tube_spline()
-        self.show_tube_init()
+        # 合并模式：原地缩放已有的各层管道网格，actor 与 mapper 保持不变
+        if self.networks_lod and all(network.is_scalable() for network in self.networks_lod):
+            for network in self.networks_lod:
+                network.set_radius(self.tube_radius)
+            self.set_hover_targets()
+            self.scheduler_render.request()
+            return
+        # 否则只按缓存的中心线重新扫掠，不重新计算 NURBS 曲线；扫掠成功的管道数改变时重新添加 actor
+        if self.centerlines_tube is None:
+            self.set_grids_tube_spline()
+            self.show_tube_init()
+        elif not self.set_grids_tube_sweep():
+            self.show_tube_init()
         self.show_tube_data_time()
+        # 尚未读取数据时 self.show_tube_data_time() 不渲染，这里总是请求一次
+        self.scheduler_render.request()
 
     # 生成关节网格
     def set_grids_joint(self):
         if self.coord_joint is None:
             return
-        self.grids_joint = []
-        for i in range(self.coord_joint.shape[0]):
-            try:
-                # 关节是方形的 cube，边长 self.joint_diameter 可调整
-                grid_joint = pv.Cube(center=self.coord_joint[i], x_length=self.joint_diameter,
-                                     y_length=self.joint_diameter, z_length=self.joint_diameter)
-                grid_joint['data'] = np.zeros(grid_joint.GetNumberOfPoints())
-                self.grids_joint.append(grid_joint)
-            except Exception as error:
-                continue
+        # 关节是方形的 cube，边长 self.joint_diameter 可调整
+        self.glyph_joint = JointGlyphs(self.coord_joint, self.joint_diameter)
+        self.glyph_joint.set_lookup_table(self.lut_data)
+        self.locator_joint = CenterLocator(self.coord_joint)
+        self.set_hover_targets()
 
     # 生成管道网格
     def set_grids_tube_spline(self):
         if (self.coord_joint is None) or (self.line_tube is None):
             return
+        self.set_tubes(self.build_tubes(self.line_tube, self.coord_joint, self.hash_tube_input))
+
+    def clear_tubes(self):
         self.grids_tube = []
-        for row_tube in self.line_tube:
-            num_col_tube = len(row_tube)
+        self.ids_grids_tube = []
+        self.network_tube = None
+        self.networks_lod = []
+        self.locator_tube = None
+        self.centerlines_tube = None
+        self.data_now = None
+
+    # 计算管道的中心线与网格，不修改界面状态，可在读取线程中运行；返回 self.set_tubes() 所需的结果
+    # job 为后台任务时通过它报告进度，并在每段管道之间检查是否取消，取消时返回 None
+    def build_tubes(self, line_tube: TubeTable, coord_joint, hash_tube_input, job=None):
+        tubes = {'centerlines': None, 'networks_lod': [], 'locator': None}
+        if not self.flag_tube_merged:
+            ids_tube, list_ctrl_points = line_tube.get_ctrl_points(coord_joint)
+            # 中心线分段批量计算（每段内一次批量计算，详见 tube_geometry.eval_curves），各段之间检查是否取消
+            list_points = []
+            for start in range(0, len(list_ctrl_points), NUM_TUBE_CHUNK):
+                if (job is not None) and (not job.report(start, len(list_ctrl_points), '管路中心线计算中')):
+                    return None
+                list_points += tube_geometry.eval_centerlines(list_ctrl_points[start:start + NUM_TUBE_CHUNK],
+                                                              self.tube_delta, self.tube_tolerance)
+            tubes['centerlines'] = (ids_tube, list_points)
+            return tubes
+        # 合并模式：每层细节层次先查缓存，都命中则跳过网格生成
+        num_level = len(self.tube_lod) if self.flag_lod else 1
+        keys_cache = [None] * num_level
+        if hash_tube_input is not None:
+            keys_cache = [self.geometry_cache.get_key(hash_tube_input, self.get_tube_settings(level))
+                          for level in range(num_level)]
+        networks_lod = [self.geometry_cache.load(key_cache) if key_cache is not None else None
+                        for key_cache in keys_cache]
+        if not all(networks_lod):
+            ids_tube, list_ctrl_points = line_tube.get_ctrl_points(coord_joint)
+            callback = None
+            if job is not None:
+                callback = lambda num_done, num_total, stage='管路网格生成中': job.report(num_done, num_total, stage)
+            for level in range(num_level):
+                if networks_lod[level] is None:
+                    networks_lod[level], list_points = self.build_network_tube(level, ids_tube, list_ctrl_points,
+                                                                               callback)
+                    if networks_lod[level] is None:
+                        return None
+                    if level == 0:
+                        tubes['centerlines'] = (ids_tube, list_points)
+                    if keys_cache[level] is not None:
+                        self.geometry_cache.save(keys_cache[level], networks_lod[level])
+        tubes['networks_lod'] = networks_lod
+        # 中心线按管道半径的间距加密
+        tubes['locator'] = CenterLocator.from_network(networks_lod[0], self.tube_radius)
+        return tubes
+
+    # 使用 self.build_tubes() 的结果：非合并模式按中心线扫掠各管道，合并模式绑定各层网格
+    def set_tubes(self, tubes: dict):
+        self.clear_tubes()
+        self.centerlines_tube = tubes['centerlines']
+        if not tubes['networks_lod']:
+            self.set_grids_tube_sweep()
+            self.set_hover_targets()
+            return
+        self.networks_lod = tubes['networks_lod']
+        # 扫掠的是半径为1的表面，按 self.tube_radius 缩放；绑定各管道两端的关节，用于逐帧更新标量
+        for network in self.networks_lod:
+            network.set_radius(self.tube_radius)
+            network.set_endpoints(self.topology_tube.endpoints[network.ids_tube])
+        self.level_lod = 0
+        self.network_tube = self.networks_lod[0]
+        self.locator_tube = tubes['locator']
+        self.set_hover_targets()
+
+    # 生成第 level 层细节层次的合并管道网格（半径为1），返回（网格，中心线离散点列表）
+    # callback(已完成的管道数, 管道总数[, 当前步骤]) 为后台任务的进度，返回 False 时取消，返回（None, None）
+    # 没有 callback（在主线程中生成）时，多进程生成的进度由 self.show_tube_progress() 显示
+    def build_network_tube(self, level: int, ids_tube: list, list_ctrl_points: list, callback=None):
+        tolerance, num_sides = self.get_tube_lod(level)
+        # 管道很多时，用多进程生成网格，否则在本进程中逐段生成，详见 parallel_geometry.TubeMeshBuilder
+        # 子进程出错（如序列化失败、打包后的程序无法启动子进程）时退回单进程生成，单进程可能很慢，显示原因
+        if (len(ids_tube) >= self.num_tube_parallel) and (self.num_process > 1):
             try:
-                if (num_col_tube < 3) or (not num_col_tube % 3 == 0):
-                    continue
-                elif num_col_tube == 3:
-                    ctrl_points = np.array([self.coord_joint[int(row_tube[1])],
-                                            self.coord_joint[int(row_tube[2])]])
+                builder = TubeMeshBuilder(self.num_process)
+                if callback is None:
+                    builder.progress.connect(self.show_tube_progress)
+                result = builder.build(ids_tube, list_ctrl_points, self.tube_delta, tolerance, num_sides, callback)
+                return result if result is not None else (None, None)
+            except Exception as error:
+                stage = '多进程生成失败（{}），单进程生成中'.format(error)
+                if callback is not None:
+                    callback = lambda num_done, num_total, callback=callback: callback(num_done, num_total, stage)
                 else:
-                    ctrl_points = np.array([self.coord_joint[int(row_tube[1])],
-                                            *[row_tube[i:i + 3] for i in range(3, num_col_tube, 3)],
-                                            self.coord_joint[int(row_tube[2])]])
-                # 使用 geomdl
-                curve = NURBS.Curve()
-                curve.degree = min(3, len(ctrl_points) - 1)  # 必须满足 degree ≤ (控制点数 − 1)，但是 degree 越大计算量越大
-                curve.ctrlpts = ctrl_points
-                curve.knotvector = generate(curve.degree, len(curve.ctrlpts))  # 自动计算合理的节点向量
-                curve.delta = 0.01  # 取样密度，可调整，0.01约等于100段
-                points = np.array(curve.evalpts)  # 得到曲线上的离散点
-                # 使用 pyvista
-                poly = pv.PolyData()
-                poly.points = points
-                poly.lines = np.hstack([np.array([len(points)] + list(range(len(points))), dtype=np.int32)])
+                    self.textBrowser_215.setText(stage)
+                    QtWidgets.QApplication.processEvents()
+        result = TubeMeshBuilder(1).build(ids_tube, list_ctrl_points, self.tube_delta, tolerance, num_sides,
+                                          callback)
+        return result if result is not None else (None, None)
+
+    # 第 level 层的（弦高容差，截面边数）；第0层的容差为 self.tube_tolerance，
+    # 其余各层按倍数放大，self.tube_tolerance 为0（固定取样）时以 1mm 为基准
+    def get_tube_lod(self, level: int):
+        factor, num_sides = self.tube_lod[level]
+        if level == 0:
+            return self.tube_tolerance, num_sides
+        return factor * (self.tube_tolerance if self.tube_tolerance > 0 else 1.0), num_sides
+
+    # 按缓存的中心线扫掠各管道的网格（非合并模式）
+    # 若网格已存在且管道数不变，则原地替换网格内容，已添加的 actor 无需重新添加，返回 True
+    # 管道数改变（例如某根管道扫掠失败）时换为新的网格列表，返回 False，需调用 self.show_tube_init() 重新添加 actor
+    def set_grids_tube_sweep(self) -> bool:
+        if self.centerlines_tube is None:
+            return True
+        grids_tube, ids_grids_tube = [], []
+        for id_tube, points in zip(*self.centerlines_tube):
+            try:
                 # 管道是圆柱形 spline，半径 self.tube_radius 可调整
-                grid_tube = poly.tube(radius=self.tube_radius)
+                grid_tube = tube_geometry.sweep_tube(points, self.tube_radius)
                 grid_tube['data'] = np.zeros(grid_tube.GetNumberOfPoints())
-                self.grids_tube.append(grid_tube)
+                grids_tube.append(grid_tube)
+                ids_grids_tube.append(id_tube)
             except Exception as error:
                 continue
+        self.ids_grids_tube = ids_grids_tube
+        if len(grids_tube) == len(self.grids_tube):
+            for grid_tube_old, grid_tube in zip(self.grids_tube, grids_tube):
+                grid_tube_old.copy_from(grid_tube)
+            return True
+        self.grids_tube = grids_tube
+        return False
+
+    # 显示 tube_info.csv 中被跳过的行，最多列出前20行
+    def show_tube_skipped(self, rows_skipped: list):
+        if not rows_skipped:
+            return
+        text_rows = ', '.join(str(row) for row in rows_skipped[:20]) + (' ...' if len(rows_skipped) > 20 else '')
+        self.textBrowser_215.setText('{} 跳过 {} 行（列数不是3的倍数）：第 {} 行'.format(
+            self.file_tube, len(rows_skipped), text_rows))
+
+    # 多进程生成网格时显示进度，并处理界面事件，避免窗口无响应
+    def show_tube_progress(self, num_done: int, num_total: int):
+        self.textBrowser_215.setText('管路网格生成中：{} / {}'.format(num_done, num_total))
+        QtWidgets.QApplication.processEvents()
+
+    # 后台任务的进度，总数为0时只显示当前步骤；任务在读取线程中运行，无需处理界面事件
+    def show_job_progress(self, num_done: int, num_total: int, stage: str):
+        if num_total > 0:
+            stage += '：{} / {}'.format(num_done, num_total)
+        self.textBrowser_215.setText(stage)
+
+    # 影响第 level 层管道网格的全部参数，用作几何缓存的键
+    # 缓存的是半径为1的网格，管道半径与关节边长都只是缩放系数，因此不计入
+    def get_tube_settings(self, level: int = 0) -> dict:
+        tolerance, num_sides = self.get_tube_lod(level)
+        return {'tube_delta': self.tube_delta, 'tube_tolerance': tolerance, 'num_sides': num_sides}
+
+    # 管道半径在屏幕上的像素数对应的细节层次，按关节包围盒中心处的投影比例估算
+    def get_lod_level(self) -> int:
+        camera = self.plotter.renderer.GetActiveCamera()
+        height = self.plotter.renderer.GetSize()[1]
+        # 窗口尚未显示
+        if height <= 0:
+            return 0
+        if camera.GetParallelProjection():
+            length_view = 2 * camera.GetParallelScale()
+        else:
+            distance = np.linalg.norm(np.subtract(camera.GetPosition(), self.glyph_joint.cloud.center))
+            length_view = 2 * distance * np.tan(np.radians(camera.GetViewAngle()) / 2)
+        pixels = self.tube_radius * height / max(length_view, 1e-9)
+        for level, pixel_min in enumerate(self.lod_pixels):
+            if pixels >= pixel_min:
+                return level
+        return len(self.lod_pixels)
+
+    # 渲染开始时调用（renderer 的 StartEvent），切换关节与管道的细节层次
+    def update_lod(self, obj=None, event=None):
+        if (not self.flag_lod) or (self.glyph_joint is None):
+            return
+        level = self.get_lod_level() + (1 if self.flag_interacting else 0)
+        self.set_lod_level(min(level, len(self.tube_lod) - 1))
+
+    def set_lod_level(self, level: int):
+        self.glyph_joint.set_level(level)
+        if (not self.networks_lod) or (self.network_tube is None):
+            return
+        level = min(level, len(self.networks_lod) - 1)
+        if level == self.level_lod:
+            return
+        self.level_lod = level
+        self.network_tube = self.networks_lod[level]
+        # 同一个 actor 换一个输入网格，并写入当前时间步的标量
+        if self.actors_tube:
+            self.actors_tube[0].mapper.SetInputData(self.network_tube.mesh)
+            if self.data_now is not None:
+                self.set_network_data(self.data_now)
+
+    def start_interaction(self, obj=None, event=None):
+        self.flag_interacting = True
+
+    # 交互结束后再渲染一次，恢复交互前的细节层次
+    def end_interaction(self, obj=None, event=None):
+        self.flag_interacting = False
+        self.scheduler_render.request()
 
     # ************************************************************
     # ************************************************************
@@ -346,11 +696,28 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
     # ************************************************************
     # ************************************************************
     # “选择文件”按钮：选择数据文件：速度、压强、温度
+    # 可选择数据文件夹，或打包的时序数据文件（.tsd，由 data_pack.py 从文件夹转换得到）
     def get_directory_data(self):
-        self.lineEdit_212.setText(QtWidgets.QFileDialog.getExistingDirectory(self, caption='请选择文件夹'))
+        box = QMessageBox(QMessageBox.Question, '温馨提示', '请选择数据文件夹，或打包的时序数据文件（.tsd）', parent=self)
+        button_folder = box.addButton('文件夹', QMessageBox.AcceptRole)
+        button_pack = box.addButton('打包文件', QMessageBox.AcceptRole)
+        box.addButton('取消', QMessageBox.RejectRole)
+        box.exec_()
+        if box.clickedButton() is button_folder:
+            self.lineEdit_212.setText(QtWidgets.QFileDialog.getExistingDirectory(self, caption='请选择文件夹'))
+        elif box.clickedButton() is button_pack:
+            path_file, file_type = QtWidgets.QFileDialog.getOpenFileName(self, caption='请选择文件',
+                                                                         filter='tsd (*' + PACK_SUFFIX + ')')
+            self.lineEdit_212.setText(path_file)
 
     # “读取”按钮：读取数据文件：速度、压强、温度
     def read_directory_data(self):
+        # 正在读取时，再次点击可取消读取，已读取的时间步保留
+        if self.jobs.is_running('data'):
+            if QMessageBox.Yes == QMessageBox.question(self, '温馨提示', '正在读取数据文件，是否取消读取？',
+                                                       QMessageBox.Yes | QMessageBox.No, QMessageBox.No):
+                self.jobs.cancel('data')
+            return
         # 如果未读取过管路文件，则需要先读取管路文件
         if (self.coord_joint is None) or (self.line_tube is None):
             QtWidgets.QMessageBox.critical(None, '温馨提示', '请先读取管路文件！')
@@ -362,62 +729,137 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
                 return
         self.clear_data()
         path_folder = self.lineEdit_212.text().strip()
+        # 打包的时序数据文件（由 data_pack.py 从文件夹转换得到）：内存映射打开，不解析文本
+        if os.path.isfile(path_folder) and path_folder.endswith(PACK_SUFFIX):
+            self.read_file_pack(path_folder)
         # 从一个文件夹内读取多个csv文件，csv里储存有各关节的速度、压强、温度
-        if os.path.exists(path_folder):
+        elif os.path.exists(path_folder):
             # 第一步：寻找需要的csv文件（若文件夹名为 input，则该文件夹下名为 input_xx.csv 的csv文件是需要的）
             # 例如：若 input 文件夹下存在4个文件：input_11.csv，output_3.csv，input_4.csv，not_input_6.csv
-            # 则第一步完成后，self.data_file_time_id 的值为 [11, 4]
-            self.data_file_head = os.path.basename(path_folder) + '_'
-            self.data_file_time_id = []
-            for name_file in os.listdir(path_folder):
-                if name_file.startswith(self.data_file_head) and name_file.endswith('.csv'):
-                    name_id = name_file.lstrip(self.data_file_head).rstrip('.csv')
-                    if name_id.isdigit():
-                        self.data_file_time_id.append(int(name_id))
-
+            # 则第一步完成后，找到的时间步为 [11, 4]
             # 第二步：把需要的csv文件排序
             # 例如：第一步可能先发现了 input_11.csv，再发现了 input_4.csv，但按时间顺序应先读取 input_4.csv，再读取 input_11.csv
-            # 若第二步完成前，self.data_file_time_id 的值为 [11, 4]，则第二步完成后，self.data_file_time_id 的值为 [4, 11]
-            self.data_file_time_id.sort()
-
-            # 第三步：依顺序读取csv（读取各时间步文件，并显示读取情况）
-            # 例如：若 input_4.csv 读取正确，input_11.csv 读取错误
-            # 则第三步完成后，self.data_file_time_id 的值为 [4]，self.time_total 为 1
-            # 并显示：
-            # input_4.csv  success
-            # input_11.csv  fail ! ! ! !
-            text_read = ''
-            self.data = []
-            for name_id in self.data_file_time_id:
-                name_file = self.data_file_head + str(name_id) + '.csv'
-                path_file = os.path.join(path_folder, name_file)
-                try:
-                    data_t = pd.read_csv(path_file, header=0, encoding='utf-8').fillna(0).to_numpy()[:, 1:4]
-                    # 转置，按（物理量，关节编号）的顺序
-                    self.data.append(data_t.T)
-                    text_read += name_file + '  success\n'
-                except Exception as error:
-                    self.data_file_time_id.remove(name_id)
-                    text_read += name_file + '  fail ! ! ! !\n'
-            self.data = np.array(self.data)
-            self.time_total = len(self.data_file_time_id)
+            # 若第二步完成前，找到的时间步为 [11, 4]，则第二步完成后，依次为 [4, 11]
+            # 第一步与第二步详见 data_loader.list_data_files
+            self.data_file_head = os.path.basename(os.path.normpath(path_folder)) + '_'
+            data_files = list_data_files(path_folder)
+
+            # 第三步：依顺序读取csv（读取各时间步文件，并显示读取情况，详见 self.set_data_read()）
+            # 数据量超过内存预算（或选择了延迟读取）时，各时间步在显示时才读取，详见 data_loader.LazySeries
+            data_lazy = LazySeries(path_folder, data_files, self.data_budget, self.show_data_fail)
+            if (data_lazy.shape_frame is not None) and (
+                    self.flag_data_lazy or (data_lazy.get_nbytes_total() > self.data_budget)):
+                self.set_data_read(data_lazy, data_files, data_lazy.flags)
+                return
+            # 否则在后台读取：各文件转置，按（物理量，关节编号）的顺序，写入按文件数预先分配的时序数据
+            # 文件很多时用多进程并行读取，子进程出错时退回单进程读取，详见 data_loader.DataLoader
+            # 读取过程中已读取的时间步先行显示，可拖动时间轴查看
+            num_process = self.num_process if len(data_files) >= self.num_file_parallel else 1
+            loader = DataLoader(path_folder, data_files, num_process)
+            loader.progress.connect(self.show_job_progress)
+            loader.partial.connect(self.set_data_partial)
+            loader.loaded.connect(self.set_data_loaded)
+            loader.failed.connect(self.show_data_load_fail)
+            self.jobs.start('data', loader)
+        else:
+            QtWidgets.QMessageBox.critical(None, '温馨提示', '文件夹不存在，请检查路径是否正确！')
 
-            if not self.data_file_time_id:
-                text_read = 'no file !'
+    # 后台读取中已读取的时间步，第一次收到时绘制第一个时间步
+    def set_data_partial(self, data):
+        if not self.jobs.is_current('data', self.sender()):
+            return
+        flag_first = self.data is None
+        self.data = data
+        self.data_file_time_id = self.data.time_ids.tolist()
+        self.time_total = len(self.data_file_time_id)
+        if flag_first:
+            self.time_present_id = 0
+            self.show_tube_data_time()
 
-            self.textBrowser_215.setText(text_read)
+    # 后台读取完毕（或已取消），显示读取情况；读取过程中监控到的新文件随后追加
+    def set_data_loaded(self, result):
+        loader = self.sender()
+        if not self.jobs.finish('data', loader):
+            return
+        data, flags = result
+        flag_first = self.data is None
+        self.set_data_read(data, loader.data_files, flags, flag_first)
+        if loader.flag_cancel:
+            self.textBrowser_215.setText(self.textBrowser_215.toPlainText() + 'cancelled\n')
+        files_pending, self.files_data_pending = self.files_data_pending, []
+        for path_file in files_pending:
+            self.get_new_data(path_file)
+
+    def show_data_load_fail(self, text_error: str):
+        if not self.jobs.finish('data', self.sender()):
+            return
+        self.files_data_pending = []
+        self.clear_data()
+        QtWidgets.QMessageBox.critical(None, '温馨提示', '数据文件读取失败：' + text_error)
+
+    # 使用读取的时序数据，并显示各文件的读取情况；flag_show 为 True 时绘制第一个时间步
+    # 例如：若 input_4.csv 读取正确，input_11.csv 读取错误
+    # 则 self.data_file_time_id 的值为 [4]，self.time_total 为 1
+    # 并显示：
+    # input_4.csv  success
+    # input_11.csv  fail ! ! ! !
+    def set_data_read(self, data, data_files: list, flags: list, flag_show: bool = True):
+        self.data = data
+        # 尚未读取的文件（flags 为 -1：延迟读取，或已取消读取）不显示；延迟读取时读取失败的时间步仍保留，显示为零
+        text_read = ''
+        for (name_id, name_file), flag in zip(data_files, flags):
+            if flag >= 0:
+                text_read += name_file + ('  success\n' if flag else '  fail ! ! ! !\n')
+        if isinstance(self.data, LazySeries):
+            text_read += '{} files, the others are read when shown\n'.format(len(data_files))
+        self.data_file_time_id = [] if self.data is None else self.data.time_ids.tolist()
+        self.time_total = len(self.data_file_time_id)
 
-            # 绘制第一个时间步
-            if self.data is not None:
-                self.time_present_id = 0
-                self.show_tube_data_time()
+        if not self.data_file_time_id:
+            text_read = 'no file !'
 
-        else:
-            QtWidgets.QMessageBox.critical(None, '温馨提示', '文件夹不存在，请检查路径是否正确！')
+        self.textBrowser_215.setText(text_read)
+
+        # 绘制第一个时间步
+        if (self.data is not None) and flag_show:
+            self.time_present_id = 0
+            self.show_tube_data_time()
+
+    # 延迟读取时某个时间步读取失败，该时间步显示为零
+    def show_data_fail(self, name_file: str):
+        text_read = self.textBrowser_215.toPlainText()
+        text_read += name_file + '  fail ! ! ! !\n'
+        self.textBrowser_215.setText(text_read)
+
+    # 读取打包的时序数据文件，self.data 为数据块的只读内存映射，只有显示到的时间步才从磁盘读入内存
+    def read_file_pack(self, path_file: str):
+        try:
+            self.data, self.data_file_head = open_pack(path_file)
+        except Exception as error:
+            QtWidgets.QMessageBox.critical(None, '温馨提示', '数据文件格式不正确！')
+            return
+        self.data_file_time_id = [] if self.data is None else self.data.time_ids.tolist()
+        self.time_total = len(self.data_file_time_id)
+        if self.data is None:
+            self.textBrowser_215.setText('no file !')
+            return
+        self.textBrowser_215.setText('{}  success\n{} time steps, {} joints\n'.format(
+            os.path.basename(path_file), self.data.shape[0], self.data.shape[2]))
+        # 绘制第一个时间步
+        self.time_present_id = 0
+        self.show_tube_data_time()
 
     # “清空”按钮：清空数据文件：速度、压强、温度
     def clear_directory_data(self):
-        if self.data is not None:
+        # 正在读取时，取消读取并丢弃已读取的部分
+        if self.jobs.is_running('data'):
+            if QMessageBox.Yes == QMessageBox.question(self, '温馨提示', '正在读取数据文件，确认取消并清空？',
+                                                       QMessageBox.Yes | QMessageBox.No, QMessageBox.No):
+                self.jobs.cancel('data')
+                self.jobs.clear('data')
+                self.files_data_pending = []
+                self.clear_data()
+        elif self.data is not None:
             if QMessageBox.Yes == QMessageBox.question(self, '温馨提示', '确认清空已读过的数据？',
                                                        QMessageBox.Yes | QMessageBox.No, QMessageBox.No):
                 self.clear_data()
@@ -429,6 +871,7 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         self.data_file_time_id = []
         self.time_total = len(self.data_file_time_id)
         self.data = None
+        self.data_now = None
         self.textBrowser_215.setText('')
         self.textBrowser_300.setText('')
         self.show_not_data()
@@ -440,33 +883,38 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         self.textBrowser_3001.setText('?')
         # 重新绘制
         self.set_mapper_mode(False)
-        if len(self.plotter.scalar_bars):
-            self.plotter.remove_scalar_bar()
+        self.show_scalar_bar(-1)
 
     def get_new_data(self, path_file: str):
+        # 正在后台读取时，新文件等读取完毕后再追加，保证时间步的顺序
+        if self.jobs.is_running('data'):
+            self.files_data_pending.append(path_file)
+            return
         if os.path.exists(path_file):
             name_file = os.path.basename(path_file)
-            if name_file.startswith(self.data_file_head) and name_file.endswith('.csv'):
-                name_id = name_file.lstrip(self.data_file_head).rstrip('.csv')
-                if name_id.isdigit():
-                    try:
-                        data_t = pd.read_csv(path_file, header=0, encoding='utf-8').fillna(0).to_numpy()[:, 1:4]
-                        text_read = self.textBrowser_215.toPlainText()
-                        text_read += name_file + '  success\n'
-                        self.textBrowser_215.setText(text_read)
-                    except Exception as error:
-                        text_read = self.textBrowser_215.toPlainText()
-                        text_read += name_file + '  fail ! ! ! !\n'
-                        self.textBrowser_215.setText(text_read)
-                        return
-                    data_t = np.expand_dims(data_t.T, axis=0)
+            # 文件名与 data_loader.list_data_files 按同样的规则解析时间步
+            time_id = get_time_id(name_file, self.data_file_head)
+            if time_id is not None:
+                try:
+                    data_t = pd.read_csv(path_file, header=0, encoding='utf-8').fillna(0).to_numpy()[:, 1:4]
+                    # 追加到时序数据末尾，均摊 O(1)，不复制已有的时间步；关节数与已有数据不一致时读取失败
                     if self.data is None:
-                        self.data = data_t
+                        self.data = TimeSeries(*data_t.T.shape)
+                    if isinstance(self.data, LazySeries):
+                        self.data.append_file(name_file, time_id, data_t.T)
                     else:
-                        self.data = np.concatenate([self.data, data_t], axis=0)
-                    self.data_file_time_id.append(int(name_id))
-                    self.time_total = len(self.data_file_time_id)
-                    self.show_last()
+                        self.data.append(data_t.T, time_id)
+                    text_read = self.textBrowser_215.toPlainText()
+                    text_read += name_file + '  success\n'
+                    self.textBrowser_215.setText(text_read)
+                except Exception as error:
+                    text_read = self.textBrowser_215.toPlainText()
+                    text_read += name_file + '  fail ! ! ! !\n'
+                    self.textBrowser_215.setText(text_read)
+                    return
+                self.data_file_time_id.append(time_id)
+                self.time_total = len(self.data_file_time_id)
+                self.show_last()
 
     def auto_read_data(self):
         if not self.radioButton_213.isChecked():
@@ -477,8 +925,8 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
             QtWidgets.QMessageBox.critical(None, '温馨提示', '请先读取管路文件！')
             return
         path_folder = self.lineEdit_212.text().strip()
-        # 从一个文件夹内读取多个csv文件，csv里储存有各关节的速度、压强、温度
-        if os.path.exists(path_folder):
+        # 从一个文件夹内读取多个csv文件，csv里储存有各关节的速度、压强、温度；打包的数据文件不监控
+        if os.path.isdir(path_folder):
             self.worker = WatchdogWorker(path_folder)
             self.worker.moveToThread(self.thread)
             self.observer.schedule(self.worker, path_folder, recursive=False)
@@ -509,22 +957,36 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
     def set_bar_range_min(self):
         id_attr = int(self.comboBox_311.currentIndex())
         self.scalar_bar_range[id_attr][0] = float(self.lineEdit_3111.text().strip())
+        self.set_lut_range()
         self.show_tube_data_time()
 
     def set_bar_range_max(self):
         id_attr = int(self.comboBox_311.currentIndex())
         self.scalar_bar_range[id_attr][1] = float(self.lineEdit_3112.text().strip())
+        self.set_lut_range()
         self.show_tube_data_time()
 
+    # 颜色映射表的范围取当前显示属性的数值范围，未改变则不修改映射表
+    def set_lut_range(self):
+        id_attr = int(self.comboBox.currentIndex())
+        range_lut = (float(self.scalar_bar_range[id_attr][0]), float(self.scalar_bar_range[id_attr][1]))
+        if range_lut == self.range_lut:
+            return
+        self.range_lut = range_lut
+        self.lut_data.scalar_range = range_lut
+
     def show_monitor_data(self, id_attr: int, data_now):
         txt = self.textBrowser_300.toPlainText()
         if txt == '':
             txt = '关节\t' + 'time_step\t' + 'attribute\t' + 'location (mm)\t\n'
-        for i in range(len(self.grids_joint)):
-            if not float(self.scalar_bar_range[id_attr][0]) <= data_now[i] <= float(self.scalar_bar_range[id_attr][1]):
-                txt += ('joint_' + str(i) + '\t' + str(self.data_file_time_id[int(self.time_present_id)]) + '\t' +
-                        '{:.2f} '.format(data_now[i]) + self.scalar_bar_unit[id_attr] + '\t' + str(
-                            np.round(self.grids_joint[i].center, 2)) + '\n')
+        # 一次找出超出范围的关节，只为这些关节生成文字
+        data_now = np.asarray(data_now[:self.glyph_joint.num_joint])
+        mask_out = ~((float(self.scalar_bar_range[id_attr][0]) <= data_now) &
+                     (data_now <= float(self.scalar_bar_range[id_attr][1])))
+        for i in np.flatnonzero(mask_out):
+            txt += ('joint_' + str(i) + '\t' + str(self.data_file_time_id[int(self.time_present_id)]) + '\t' +
+                    '{:.2f} '.format(data_now[i]) + self.scalar_bar_unit[id_attr] + '\t' + str(
+                        np.round(self.glyph_joint.get_center(i), 2)) + '\n')
         self.textBrowser_300.setText(txt)
 
     def clear_monitor(self):
@@ -560,32 +1022,35 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         self.flag_autorun = False
         self.remove_actors_joint()
         self.remove_actors_tube()
-        for i in range(len(self.grids_joint)):
-            self.actors_joint.append(
-                self.plotter.add_mesh(self.grids_joint[i], name='joint_' + str(i), color=pv.global_theme.color,
-                                      cmap='jet', show_edges=True, line_width=1, show_scalar_bar=False, pickable=True))
+        self.labels_pick.clear()
+        if self.glyph_joint is not None:
+            self.plotter.add_actor(self.glyph_joint.actor, name='joint', pickable=True)
+        if self.network_tube is not None:
+            self.actors_tube.append(
+                self.plotter.add_mesh(self.network_tube.mesh, name='tube', color=pv.global_theme.color,
+                                      cmap='jet', show_edges=False, show_scalar_bar=False, pickable=True))
         for i in range(len(self.grids_tube)):
             self.actors_tube.append(
                 self.plotter.add_mesh(self.grids_tube[i], name='tube_' + str(i), color=pv.global_theme.color,
                                       cmap='jet', show_edges=False, show_scalar_bar=False, pickable=True))
+        # 所有管道 actor 共用同一个颜色映射表，数值范围由映射表决定
+        for actor_tube in self.actors_tube:
+            actor_tube.mapper.SetLookupTable(self.lut_data)
+            actor_tube.mapper.UseLookupTableScalarRangeOn()
 
     def set_mapper_mode(self, flag: bool):
+        if self.glyph_joint is not None:
+            self.glyph_joint.set_scalar_visibility(flag)
         if flag:
-            for i in range(len(self.actors_joint)):
-                self.actors_joint[i].mapper.SetScalarVisibility(True)
             for i in range(len(self.actors_tube)):
                 self.actors_tube[i].mapper.SetScalarVisibility(True)
         else:
-            for i in range(len(self.actors_joint)):
-                self.actors_joint[i].mapper.SetScalarVisibility(False)
             for i in range(len(self.actors_tube)):
                 self.actors_tube[i].mapper.SetScalarVisibility(False)
 
     def remove_actors_joint(self):
-        if self.actors_joint:
-            for actor_joint in self.actors_joint:
-                self.plotter.remove_actor(actor_joint)
-        self.actors_joint = []
+        if self.glyph_joint is not None:
+            self.plotter.remove_actor(self.glyph_joint.actor)
 
     def remove_actors_tube(self):
         if self.actors_tube:
@@ -595,8 +1060,8 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
 
     def show_tube_data_time(self):
         # 如果连数据都没有就无法更新数据
-        if (self.data is None) or (not self.grids_joint) or (not self.grids_joint) or (not self.actors_joint) or (
-                not self.actors_tube) or (len(self.data) <= int(self.time_present_id)):
+        if (self.data is None) or (self.glyph_joint is None) or (not self.actors_tube) or (
+                len(self.data) <= int(self.time_present_id)):
             return
 
         # 显示当前时间步
@@ -615,51 +1080,54 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         # 提取该时刻该属性的数据为 data_now，其维度等于关节数
         # 若提取不足或出错，则 data_now 对应项置零
         try:
-            data_now = np.zeros(len(self.grids_joint))
+            data_now = np.zeros(self.glyph_joint.num_joint)
             data_extract = self.data[self.time_present_id, id_attr, :]
-            dim_extract = min(len(self.grids_joint), len(data_extract))
+            dim_extract = min(self.glyph_joint.num_joint, len(data_extract))
             data_now[0:dim_extract] = data_extract[0:dim_extract]
         except Exception as error:
-            data_now = np.zeros(len(self.grids_joint))
-
-        # 更新关节值
-        for i in range(len(self.grids_joint)):
-            self.grids_joint[i]['data'] = np.full(self.grids_joint[i].GetNumberOfPoints(),
-                                                  data_now[i])
-            self.grids_joint[i].Modified()
-            self.actors_joint[i].mapper.SetScalarRange(self.scalar_bar_range[id_attr][0],
-                                                       self.scalar_bar_range[id_attr][1])
-            self.actors_joint[i].mapper.Update()
+            data_now = np.zeros(self.glyph_joint.num_joint)
+
+        # 更新关节值：所有关节一次写入；颜色范围由共用的颜色映射表决定，逐帧无需设置
+        self.glyph_joint.set_data(data_now)
+        self.data_now = data_now
+        # 更新管道值：合并模式下只写入当前显示的一层
+        if self.network_tube is not None:
+            self.set_network_data(data_now)
+        if self.grids_tube:
+            values_tube = self.topology_tube.gather(data_now, self.ids_grids_tube)
         for i in range(len(self.grids_tube)):
-            self.grids_tube[i]['data'] = np.linspace(start=data_now[int(self.line_tube[i][1])],
-                                                     stop=data_now[int(self.line_tube[i][2])],
-                                                     num=self.grids_tube[i].GetNumberOfPoints())
+            # 按沿管道的弧长参数插值，详见 tube_geometry.get_arc_parameters
+            self.grids_tube[i]['data'] = values_tube[i, 0] + (values_tube[i, 1] - values_tube[i, 0]) * \
+                self.grids_tube[i]['t']
             self.grids_tube[i].Modified()
-            self.actors_tube[i].mapper.SetScalarRange(self.scalar_bar_range[id_attr][0],
-                                                      self.scalar_bar_range[id_attr][1])
-            self.actors_tube[i].mapper.Update()
-        self.plotter.render()
-
-        # 绘制 scalar_bar
-        # self.plotter.scalar_bars 储存当前画板上的 scalar_bar 信息
-        # 若不存在 scalar_bar，则 len(self.plotter.scalar_bars) = 0，此时无需清除 scalar_bar
-        if len(self.plotter.scalar_bars):
-            for name, scalar_bar in list(self.plotter.scalar_bars.items()):
-                if not scalar_bar.GetTitle() == self.scalar_bar_title[id_attr]:
-                    self.plotter.remove_scalar_bar(name)
-        if not self.plotter.scalar_bars:
-            self.plotter.add_scalar_bar(title=self.scalar_bar_title[id_attr], color='firebrick',
-                                        title_font_size=15, label_font_size=10, width=0.5,
-                                        vertical=False, position_x=0.3, position_y=0.1)
+        self.scheduler_render.request()
+
+        # 显示当前属性的数值条，其范围随颜色映射表更新
+        self.show_scalar_bar(id_attr)
 
         self.show_monitor_data(id_attr, data_now)
 
         if not self.comboBox_311.currentIndex() == id_attr:
             self.comboBox_311.setCurrentIndex(id_attr)
 
+    # 只切换前后两个数值条的可见性，id_attr 为 -1 时全部隐藏
+    def show_scalar_bar(self, id_attr: int):
+        if id_attr == self.id_scalar_bar:
+            return
+        if self.id_scalar_bar >= 0:
+            self.scalar_bars[self.id_scalar_bar].VisibilityOff()
+        if id_attr >= 0:
+            self.scalar_bars[id_attr].VisibilityOn()
+        self.id_scalar_bar = id_attr
+
+    # 合并模式下整帧一次写入同一个标量数组，详见 network_actors.TubeNetwork.set_frame
+    def set_network_data(self, data_now):
+        self.network_tube.set_frame(data_now)
+
     def show_attribute(self):
         # 先关闭自动播放状态
         self.flag_autorun = False
+        self.set_lut_range()
         self.show_tube_data_time()
 
     def show_first(self):
@@ -712,30 +1180,76 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
         else:
             self.timer.stop()
 
-    def onPick(self, picked_mesh, cid):
-        if picked_mesh is None or cid == -1:
+    # 拾取：actor 为点击到的 actor，position 为点击处的世界坐标
+    # 用预先建立的定位器找到最近的关节、管道或油箱单元，标注其编号与当前时间步各属性的值
+    def onPick(self, actor, position):
+        text_pick = None
+        if (self.glyph_joint is not None) and (actor is self.glyph_joint.actor):
+            text_pick = self.get_text_joint(self.locator_joint.find(position))
+        elif actor in self.actors_tube:
+            # 合并模式：最近的圆环中心所属的管道及其弧长参数；否则每根管道一个 actor，取最近的点
+            if self.network_tube is not None:
+                i = self.locator_tube.find(position)
+                id_tube = int(self.locator_tube.values['tube_id'][i])
+                t = float(self.locator_tube.values['t'][i])
+            else:
+                i = self.actors_tube.index(actor)
+                id_tube = int(self.ids_grids_tube[i])
+                t = float(self.grids_tube[i]['t'][np.argmin(np.sum((self.grids_tube[i].points - position) ** 2,
+                                                                    axis=1))])
+            text_pick = self.get_text_tube(id_tube, t)
+        elif (self.actor_fueltank is not None) and (actor is self.actor_fueltank):
+            text_pick = 'fueltank_' + str(self.locator_fueltank.find(position))
+        if text_pick is None:
             return
-
-        # 取出 scalar
-        try:
-            scalar_val = picked_mesh['data'][cid]
-        except Exception as error:
-            scalar_val = 0
-        print(cid, scalar_val)
-
-        # 取出 cell 中心坐标（用于标注）
-        center = picked_mesh.cell_centers().points[cid]
-
-        # 打标签
-        self.plotter.add_point_labels(
-            [center],
-            [f"{scalar_val:.2f}"],
-            font_size=15,
-            text_color='white',
-            point_color='yellow',
-            point_size=12,
-            always_visible=True
-        )
+        # 打标签：标签数量固定，超出时覆盖最早的标签
+        self.labels_pick.add(position, text_pick)
+        self.scheduler_render.request()
+
+    # 悬停：鼠标所指的关节（第0组）或管道中心线取样点（第1组），返回提示文字
+    def query_hover(self, group: int, i: int):
+        if group == 0:
+            return self.get_text_joint(i)
+        return self.get_text_tube(int(self.locator_tube.values['tube_id'][i]), float(self.locator_tube.values['t'][i]))
+
+    # 悬停查询的目标：关节中心，拾取半径为 cube 的半对角线；管道中心线取样点（合并模式），拾取半径为管道半径与半个取样间距的合成
+    # 生成几何、修改关节边长或管道半径后调用
+    def set_hover_targets(self):
+        list_centers, list_radius = [np.zeros((0, 3))] * 2, [0.0] * 2
+        if self.locator_joint is not None:
+            list_centers[0], list_radius[0] = self.locator_joint.centers, self.joint_diameter * 0.87
+        if self.locator_tube is not None:
+            list_centers[1] = self.locator_tube.centers
+            list_radius[1] = float(np.hypot(self.tube_radius, self.locator_tube.step / 2))
+        self.hover.set_targets(list_centers, list_radius)
+
+    # 关节 id_joint 的编号与当前时间步各属性的值
+    def get_text_joint(self, id_joint: int) -> str:
+        values = self.get_data_joints([id_joint])
+        return self.get_text_values('joint_' + str(id_joint), values[:, 0] if values is not None else None)
+
+    # 管道 id_tube 上弧长参数 t 处的编号与各属性的值，与管道着色一致：两端关节的值按弧长参数插值
+    def get_text_tube(self, id_tube: int, t: float) -> str:
+        values = self.get_data_joints(self.topology_tube.endpoints[id_tube])
+        if values is not None:
+            values = values[:, 0] + (values[:, 1] - values[:, 0]) * t
+        return self.get_text_values('tube_' + str(id_tube), values)
+
+    def get_text_values(self, name: str, values) -> str:
+        if values is None:
+            return name
+        return name + ''.join('\n{:.2f} {}'.format(value, unit) for value, unit in zip(values, self.scalar_bar_unit))
+
+    # 当前时间步各关节所有属性的值（物理量，关节数），关节编号无效或数据不足的置零，无数据时返回 None
+    def get_data_joints(self, ids_joint):
+        if (self.data is None) or (len(self.data) <= int(self.time_present_id)):
+            return None
+        data_time = self.data[int(self.time_present_id)]
+        ids_joint = np.asarray(ids_joint, dtype=np.int64)
+        values = np.zeros((data_time.shape[0], len(ids_joint)))
+        mask = (ids_joint >= 0) & (ids_joint < data_time.shape[1])
+        values[:, mask] = data_time[:, ids_joint[mask]]
+        return values
 
     def show_bar_range(self):
         id_attr = int(self.comboBox_311.currentIndex())
@@ -806,9 +1320,12 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
                       '  列：列数为：4；依次为：关节编号（从0开始）、速度（mm/s）、压强（Pa）、温度（K）\n\n'
                       '(3) 数据文件出现异常值：\n'
                       '若数据csv文件里出现NaN，则该时间步默认用0替代出错的属性值。\n\n'
-                      '(4) 支持两种方式读入：\n'
+                      '(4) 支持三种方式读入：\n'
                       '1、一次性读取：依次点击”选择文件夹“、“读取”，把文件夹下的所有有效的数据文件读入。\n'
-                      '2、自动监测读取：选中“自动监测新增文件”，每当文件夹下新增有效的数据文件时，自动读入。\n\n'
+                      '2、自动监测读取：选中“自动监测新增文件”，每当文件夹下新增有效的数据文件时，自动读入。\n'
+                      '3、打包文件读取：点击”选择文件夹“时选择“打包文件”，选中 .tsd 文件后点击“读取”。\n'
+                      '打包文件由数据文件夹转换得到：python data_pack.py 文件夹 输出文件.tsd\n'
+                      '打包文件打开时不解析文本，只有显示到的时间步才从磁盘读入，适合时间步很多的数据；打包文件不能自动监测。\n\n'
                       '(5) 清空数据：\n'
                       '点击“清空”，将清空已读入的所有数据。\n'
                       '注意：清空并不改变自动监测状态，自动监测状态只能手动更改。\n'
@@ -850,6 +1367,13 @@ class window_flow(ui_flow.Ui_Dialog, QDialog):
 
         # 停 watchdog 和 QThread
         self.clear_observer()
+        # 取消所有后台读取任务，等待其线程结束
+        self.jobs.clear_all()
+        self.clear_loader_fueltank()
+
+        # 丢弃尚未完成的渲染，停止悬停查询
+        self.scheduler_render.cancel()
+        self.hover.set_enabled(False)
 
         # 必要：关闭绘图工具！
         self.plotter.close()